@@ -0,0 +1,303 @@
+"""
+Benchmarks for the shape pipeline.
+
+    python -m benchmarks.bench_shapes run [--quick] [--history benchmarks/results/history.json]
+    python -m benchmarks.bench_shapes compare [--history ...] [--baseline -2] [--current -1]
+
+run appends one record (timings per case, size and cache state) to the JSON history.
+compare flags cases of the current record that are significantly slower than the baseline:
+the relative slowdown must exceed --threshold and a permutation test on the samples
+must reject equal means at --alpha.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from OCC.Core.BRepTools import breptools
+
+from caddie.ladybug_geometry.geometry2d import Arc2D, Point2D, Polygon2D, Vector2D
+from caddie.plane import Plane, Translation, Rotation, AXIS_X
+from caddie.render import shape_to_gltf, tessellator, write_stl_file
+from caddie.shape2d.shapes import Face, Sketch, MODE, Text
+from caddie.shape2d.sketch import SketchBuilder
+from caddie.shape2d.text import TextBuilder
+from caddie.shape3d.boolean import BooleanBuilder
+from caddie.shape3d.extrude import ExtrusionBuilder
+from caddie.shape3d.loft import LoftBuilder
+from caddie.shape3d.section import Section
+from caddie.types.serialize import disable_disk_cache
+
+DEFAULT_HISTORY = os.path.join("benchmarks", "results", "history.json")
+
+
+# Shapes of the export cases, their triangulations are stripped for cold runs.
+export_shapes = []
+# Temporary outputs of the cases, removed after every measurement.
+scratch = contextlib.ExitStack()
+
+
+def clear_caches():
+    SketchBuilder.cache.clear()
+    TextBuilder.cache.clear()
+    BooleanBuilder.prefix_cache.clear()
+    ExtrusionBuilder.cache.clear()
+    tessellator.clear()
+    for shape in export_shapes:
+        breptools.Clean(shape)
+
+
+def grid_sketch(faces: int) -> Sketch:
+    """A plate with faces - 1 holes on a grid."""
+    holes = faces - 1
+    columns = max(1, int(holes ** 0.5))
+    rows = -(-holes // columns) if holes else 0
+    pitch = 3.0
+    return Sketch(
+        Face(MODE.ADD, Arc2D(Point2D(), pitch * (max(rows, columns) + 1))),
+        *(
+            Face(MODE.SUB, Arc2D(Point2D((i % columns - columns / 2) * pitch, (i // columns - rows / 2) * pitch), 1))
+            for i in range(holes)
+        )
+    )
+
+
+def polygon_grid_sketch(faces: int) -> Sketch:
+    """A square plate with faces - 1 square holes on a grid, only polygons."""
+    holes = faces - 1
+    columns = max(1, int(holes ** 0.5))
+    pitch = 3.0
+    width = pitch * (columns + 1)
+    return Sketch(
+        Face(MODE.ADD, Polygon2D.from_rectangle(Point2D(-width / 2, -width / 2), Vector2D(0, 1), width, width)),
+        *(
+            Face(MODE.SUB, Polygon2D.from_rectangle(
+                Point2D((i % columns - columns / 2) * pitch, (i // columns - columns / 2) * pitch), Vector2D(0, 1), 1, 1
+            ))
+            for i in range(holes)
+        )
+    )
+
+
+class PolygonSketchBuilder(SketchBuilder):
+    """Resolves every all-polygon sketch in 2D, whatever its size."""
+    polygon_fast_path = True
+    polygon_fast_path_max_faces = sys.maxsize
+
+
+def sketch_build(size: int) -> Callable[[], object]:
+    sketch = grid_sketch(size)
+    return lambda: SketchBuilder(sketch).shape2d
+
+
+def polygon_sketch(size: int) -> Callable[[], object]:
+    sketch = polygon_grid_sketch(size)
+    return lambda: SketchBuilder(sketch).shape2d
+
+
+def polygon_sketch_fast(size: int) -> Callable[[], object]:
+    sketch = polygon_grid_sketch(size)
+    return lambda: PolygonSketchBuilder(sketch).shape2d
+
+
+def text_build(size: int) -> Callable[[], object]:
+    text = Text(("CADDIE-0123456789" * (size // 16 + 1))[:size])
+    return lambda: TextBuilder(text).shape2d
+
+
+def extrusion(size: int) -> Callable[[], object]:
+    section = Section(Plane(), grid_sketch(size))
+    return lambda: ExtrusionBuilder(section).to_shape(5)
+
+
+def loft(size: int) -> Callable[[], object]:
+    sketch = Sketch(Face(MODE.ADD, Arc2D(Point2D(), 3)), Face(MODE.SUB, Arc2D(Point2D(), 2)))
+    planes = [Plane()]
+    for _ in range(size - 1):
+        planes.append(planes[-1].transformed(Translation(0, 0, 5), Rotation(3, AXIS_X)))
+    sections = [Section(p, sketch) for p in planes]
+    return lambda: LoftBuilder(False).add(*sections).to_shape()
+
+
+def boolean(size: int) -> Callable[[], object]:
+    plate = ExtrusionBuilder(Section(Plane(), grid_sketch(1))).to_shape(2)
+    columns = max(1, int(size ** 0.5))
+    tools = [
+        ExtrusionBuilder(Section(
+            Plane().transformed(Translation((i % columns - columns / 2) * 2.5, (i // columns - columns / 2) * 2.5, -1)),
+            Sketch(Face(MODE.ADD, Arc2D(Point2D(), 0.5)))
+        )).to_shape(4)
+        for i in range(size)
+    ]
+
+    def run():
+        builder = BooleanBuilder().add(plate)
+        for tool in tools:
+            builder.add(tool, "cut")
+        return builder.to_shape()
+    return run
+
+
+def export_gltf(size: int) -> Callable[[], object]:
+    shape = ExtrusionBuilder(Section(Plane(), grid_sketch(size))).to_shape(5).occ_shape
+    export_shapes.append(shape)
+    return lambda: shape_to_gltf(shape)
+
+
+def export_stl(size: int) -> Callable[[], object]:
+    shape = ExtrusionBuilder(Section(Plane(), grid_sketch(size))).to_shape(5).occ_shape
+    export_shapes.append(shape)
+    directory = scratch.enter_context(tempfile.TemporaryDirectory())
+    return lambda: write_stl_file(shape, os.path.join(directory, "out.stl"))
+
+
+CASES: Dict[str, Callable[[int], Callable[[], object]]] = {
+    "sketch_build": sketch_build,
+    "polygon_sketch": polygon_sketch,
+    "polygon_sketch_fast": polygon_sketch_fast,
+    "text_build": text_build,
+    "extrusion": extrusion,
+    "loft": loft,
+    "boolean": boolean,
+    "export_gltf": export_gltf,
+    "export_stl": export_stl,
+}
+
+SIZES = {
+    "sketch_build": [10, 50, 200],
+    "polygon_sketch": [4, 16, 50],
+    "polygon_sketch_fast": [4, 16, 50],
+    "text_build": [4, 16, 64],
+    "extrusion": [10, 50, 200],
+    "loft": [3, 10, 40],
+    "boolean": [10, 50, 200],
+    "export_gltf": [10, 200],
+    "export_stl": [10, 200],
+}
+
+QUICK_SIZES = {name: sizes[:1] for name, sizes in SIZES.items()}
+
+
+def measure(func: Callable[[], object], repeats: int, cold: bool) -> List[float]:
+    samples = []
+    if not cold:
+        func()
+    for _ in range(repeats):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(args) -> Dict:
+    disable_disk_cache()
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = []
+    for name, factory in CASES.items():
+        if args.case and name not in args.case:
+            continue
+        for size in sizes[name]:
+            for cache in ("cold", "warm"):
+                clear_caches()
+                try:
+                    samples = measure(factory(size), args.repeats, cache == "cold")
+                finally:
+                    scratch.close()
+                results.append({"case": name, "size": size, "cache": cache, "samples": samples})
+                print(f"{name:>14} size={size:<4} {cache}: median {statistics.median(samples) * 1e3:9.2f} ms")
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "label": args.label,
+        "results": results,
+    }
+    history = load_history(args.history)
+    history.append(record)
+    os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+    with open(args.history, "w") as f:
+        json.dump(history, f, indent=1)
+    return record
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def permutation_p_value(baseline: List[float], current: List[float], rounds: int = 2000, seed: int = 0) -> float:
+    """One-sided p-value for mean(current) > mean(baseline)."""
+    observed = statistics.mean(current) - statistics.mean(baseline)
+    pooled = baseline + current
+    rng = random.Random(seed)
+    extreme = 0
+    for _ in range(rounds):
+        rng.shuffle(pooled)
+        diff = statistics.mean(pooled[len(baseline):]) - statistics.mean(pooled[:len(baseline)])
+        if diff >= observed:
+            extreme += 1
+    return (extreme + 1) / (rounds + 1)
+
+
+def compare(args) -> int:
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two runs in the history to compare.")
+        return 1
+    baseline, current = history[args.baseline], history[args.current]
+    baseline_samples = {(r["case"], r["size"], r["cache"]): r["samples"] for r in baseline["results"]}
+
+    regressions = 0
+    for result in current["results"]:
+        key = result["case"], result["size"], result["cache"]
+        if key not in baseline_samples:
+            continue
+        base, cur = baseline_samples[key], result["samples"]
+        change = statistics.median(cur) / statistics.median(base) - 1
+        p_value = permutation_p_value(base, cur)
+        slower = change > args.threshold and p_value < args.alpha
+        regressions += slower
+        flag = "REGRESSION" if slower else ""
+        print(f"{key[0]:>14} size={key[1]:<4} {key[2]}: {change * 100:+7.1f}% (p={p_value:.3f}) {flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--quick", action="store_true", help="Only the smallest size of every case.")
+    run_parser.add_argument("--case", action="append", choices=sorted(CASES), help="Only run the given case(s).")
+    run_parser.add_argument("--label", default="")
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("--baseline", type=int, default=-2, help="History index of the baseline run.")
+    compare_parser.add_argument("--current", type=int, default=-1, help="History index of the compared run.")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown to flag.")
+    compare_parser.add_argument("--alpha", type=float, default=0.05, help="Significance level.")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from caddie.trace import span
+
+
+# Default cap per cache, in the unit returned by the cost function (estimated bytes for shape caches).
+DEFAULT_MAX_COST = 256 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 4 * 1024 * 1024 * 1024
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    total_cost: int
+    max_cost: Optional[int]
+
+
+class ShapeCache:
+    """
+    Thread safe LRU cache bounded by the summed cost of its entries.
+
+    The cost of an entry is estimated once, when it is stored. Least recently used entries
+    are evicted until the total cost is within max_cost. A max_cost of None disables eviction.
+    """
+
+    def __init__(self, max_cost: Optional[int] = DEFAULT_MAX_COST, cost: Callable[[Any], int] = lambda value: 1):
+        self.cost = cost
+        self.__max_cost = max_cost
+        self.__entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.__lock = threading.RLock()
+        self.__total_cost = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_cost(self) -> Optional[int]:
+        return self.__max_cost
+
+    @max_cost.setter
+    def max_cost(self, max_cost: Optional[int]):
+        with self.__lock:
+            self.__max_cost = max_cost
+            self.__evict()
+
+    @property
+    def total_cost(self) -> int:
+        return self.__total_cost
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        cost = self.cost(value)
+        with self.__lock:
+            old = self.__entries.pop(key, None)
+            if old is not None:
+                self.__total_cost -= old[1]
+            self.__entries[key] = value, cost
+            self.__total_cost += cost
+            self.__evict()
+
+    def __evict(self):
+        if self.__max_cost is None:
+            return
+        # The newest entry is kept even if it alone exceeds the cap.
+        while self.__total_cost > self.__max_cost and len(self.__entries) > 1:
+            _, (_, cost) = self.__entries.popitem(last=False)
+            self.__total_cost -= cost
+            self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__total_cost = 0
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove the entries whose key matches predicate, returns how many were removed."""
+        with self.__lock:
+            keys = [key for key in self.__entries if predicate(key)]
+            for key in keys:
+                self.__total_cost -= self.__entries.pop(key)[1]
+            return len(keys)
+
+    def stats(self) -> CacheStats:
+        with self.__lock:
+            return CacheStats(
+                self.hits, self.misses, self.evictions, len(self.__entries), self.__total_cost, self.__max_cost
+            )
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__entries
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self.__lock:
+            if key not in self.__entries:
+                self.misses += 1
+                raise KeyError(key)
+            return self.get(key)
+
+    def __setitem__(self, key: Hashable, value: Any):
+        self.put(key, value)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class DiskCache:
+    """
+    Content addressed file cache that can be shared by several processes on one host.
+
+    Entries are written to a temporary file in the cache directory and atomically renamed
+    into place, so readers never observe partial entries. When the directory grows beyond
+    max_bytes, the least recently used entries (by modification time, refreshed on every hit)
+    are removed until it is back under low_water * max_bytes, so the directory is not rescanned
+    on every put once the cache is full.
+    """
+    TMP_PREFIX = ".tmp-"
+
+    def __init__(self, directory: str, write: Callable[[Any, str], None], read: Callable[[str], Any],
+                 max_bytes: Optional[int] = DEFAULT_MAX_DISK_BYTES, low_water: float = 0.9):
+        self.directory = directory
+        self.write = write
+        self.read = read
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        self.__size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self.__path(key)
+        try:
+            value = self.read(path)
+            os.utime(path)
+        except (OSError, IOError):
+            # Missing, or removed by another process between read and touch.
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=self.TMP_PREFIX)
+        os.close(fd)
+        try:
+            self.write(value, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self.__lock:
+            if self.__size is not None:
+                self.__size += size
+            self.__trim()
+
+    def __entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(self.TMP_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def __trim(self):
+        if self.max_bytes is None:
+            return
+        if self.__size is not None and self.__size <= self.max_bytes:
+            return
+        # Other processes share the directory, so the running size is only an estimate: rescan.
+        entries = sorted(self.__entries())
+        self.__size = sum(size for _, size, _ in entries)
+        if self.__size <= self.max_bytes:
+            return
+        target = self.max_bytes * self.low_water
+        for _, size, path in entries:
+            if self.__size <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            self.__size -= size
+
+    def clear(self):
+        with self.__lock:
+            for _, _, path in list(self.__entries()):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.__size = 0
+
+
+disk_cache: Optional[DiskCache] = None
+
+
+def set_disk_cache(cache: Optional[DiskCache]):
+    global disk_cache
+    disk_cache = cache
+
+
+def disk_cached(key: str, build: Callable[[], Any]) -> Any:
+    """
+    Return the value stored under key (a fingerprint) in the active disk cache,
+    building and storing it on a miss. Without an active disk cache, just build.
+    """
+    if disk_cache is None:
+        return build()
+    with span("DiskCache.get") as s:
+        value = disk_cache.get(key)
+        s.set(cache="miss" if value is None else "hit")
+    if value is None:
+        value = build()
+        with span("DiskCache.put"):
+            disk_cache.put(key, value)
+    return value
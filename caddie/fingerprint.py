@@ -0,0 +1,49 @@
+import hashlib
+import json
+from enum import Enum
+from numbers import Real
+from typing import Any, Optional
+
+# Part of every digest, bumped when the canonical form changes so that entries persisted
+# under an older form can never be read back for different inputs.
+FORMAT_VERSION = 2
+
+
+def quantize(value: Real, tolerance: Optional[float]):
+    if tolerance is None:
+        return repr(float(value))
+    return int(round(value / tolerance))
+
+
+def _canonical(obj: Any, tolerance: Optional[float]) -> Any:
+    if obj is None or isinstance(obj, (bool, str)):
+        return obj
+    if isinstance(obj, Enum):
+        return [type(obj).__name__, obj.name]
+    if isinstance(obj, Real):
+        # ints and floats are quantized alike, 1 and 1.0 share a digest and 1 never
+        # collides with a float that quantizes to the integer 1.
+        return quantize(obj, tolerance)
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(o, tolerance) for o in obj]
+    if isinstance(obj, dict):
+        return [[str(k), _canonical(v, tolerance)] for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))]
+    if hasattr(obj, "fingerprint"):
+        return obj.fingerprint(tolerance)
+    if hasattr(obj, "to_dict"):
+        return _canonical(obj.to_dict(), tolerance)
+    if hasattr(obj, "__dict__"):
+        return [type(obj).__name__, _canonical(vars(obj), tolerance)]
+    raise TypeError(f"Cannot fingerprint {type(obj)}")
+
+
+def digest(*parts: Any, tolerance: Optional[float] = None) -> str:
+    """
+    Stable, cross-process sha256 hex digest of the given build inputs.
+
+    Numbers are quantized to multiples of tolerance, so inputs that are equal within
+    the build tolerance share a digest. Objects that define fingerprint(tolerance)
+    contribute their own fingerprint.
+    """
+    encoded = json.dumps([FORMAT_VERSION, _canonical(parts, tolerance)], separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
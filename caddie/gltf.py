@@ -0,0 +1,295 @@
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from caddie.morton import morton_order
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    np.dtype(np.int8): 5120,
+    np.dtype(np.uint8): 5121,
+    np.dtype(np.int16): 5122,
+    np.dtype(np.uint16): 5123,
+    np.dtype(np.uint32): 5125,
+    np.dtype(np.float32): 5126,
+}
+ELEMENT_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4", 16: "MAT4"}
+
+# glTF is Y-up, shapes are Z-up: rotate -90 degrees around X (column-major).
+Z_UP_TO_Y_UP = [1, 0, 0, 0, 0, 0, -1, 0, 0, 1, 0, 0, 0, 0, 0, 1]
+
+
+@dataclass
+class Mesh:
+    """A triangle mesh: (n, 3) float32 positions and normals, (m, 3) vertex indices."""
+    positions: np.ndarray
+    indices: np.ndarray
+    normals: Optional[np.ndarray] = None
+    name: Optional[str] = None
+
+    @property
+    def triangle_count(self) -> int:
+        return len(self.indices)
+
+
+def merge_meshes(meshes: Sequence[Mesh], name: Optional[str] = None) -> Mesh:
+    """
+    Concatenate meshes into one, offsetting the (0-based) indices of every mesh by the
+    vertices before it. Normals are kept only when every mesh has them.
+    """
+    if not meshes:
+        return Mesh(np.empty((0, 3), np.float32), np.empty((0, 3), np.uint32), np.empty((0, 3), np.float32), name)
+    offsets = np.cumsum([0] + [len(mesh.positions) for mesh in meshes[:-1]])
+    indices = np.concatenate([
+        np.asarray(mesh.indices, dtype=np.int64).reshape(-1, 3) + offset for mesh, offset in zip(meshes, offsets)
+    ])
+    normals = None
+    if all(mesh.normals is not None for mesh in meshes):
+        normals = np.concatenate([np.asarray(mesh.normals, dtype=np.float32) for mesh in meshes])
+    return Mesh(
+        np.concatenate([np.asarray(mesh.positions, dtype=np.float32) for mesh in meshes]),
+        indices.astype(np.uint32), normals, name
+    )
+
+
+def _pad(length: int, alignment: int = 4) -> int:
+    return (alignment - length % alignment) % alignment
+
+
+def optimize_indices(indices: np.ndarray, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sort triangles along a Morton curve of their centroids, so that triangles sharing
+    vertices are close in the index buffer, and renumber vertices in order of first use.
+    Returns the new indices and, for every new vertex, its index in the old vertex arrays
+    (vertices that are not used by any triangle are dropped).
+    """
+    indices = np.asarray(indices).reshape(-1, 3)
+    if not len(indices):
+        return indices, np.empty(0, dtype=np.int64)
+    order = morton_order(positions[indices].mean(axis=1))
+    flat = indices[order].reshape(-1)
+    _, first_use = np.unique(flat, return_index=True)
+    used = flat[np.sort(first_use)]
+    remap = np.empty(len(positions), dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return remap[flat].reshape(-1, 3), used
+
+
+def quantize_positions(positions: np.ndarray) -> Tuple[np.ndarray, List[float]]:
+    """
+    Positions as 16 bit integers over their bounding box, with the column-major matrix
+    that maps them back (KHR_mesh_quantization). The scale is the same on all axes, so
+    the matrix does not change the direction of normals.
+    """
+    low = positions.min(axis=0).astype(np.float64)
+    extent = float((positions.max(axis=0) - low).max())
+    scale = extent / 65535 if extent > 0 else 1.0
+    quantized = np.round((positions - low) / scale).astype(np.uint16)
+    matrix = [scale, 0, 0, 0, 0, scale, 0, 0, 0, 0, scale, 0, low[0], low[1], low[2], 1]
+    return quantized, [float(v) for v in matrix]
+
+
+def quantize_normals(normals: np.ndarray) -> np.ndarray:
+    """Unit normals as normalized 8 bit integers."""
+    return np.round(np.clip(normals, -1, 1) * 127).astype(np.int8)
+
+
+def multiply_matrices(a: Sequence[float], b: Sequence[float]) -> List[float]:
+    """Product of two column-major 4x4 matrices."""
+    product = np.reshape(a, (4, 4)).T @ np.reshape(b, (4, 4)).T
+    return [float(v) for v in product.T.reshape(-1)]
+
+
+class GlbWriter:
+    """
+    Builds the glTF JSON and collects the arrays for the binary chunk, which are only
+    laid out when written: each array is written as is, without copying all of them
+    into one buffer first.
+
+    With quantize=True, meshes are stored with 16 bit positions and 8 bit normals
+    (KHR_mesh_quantization). Nodes showing a quantized mesh get its dequantization
+    matrix folded into their own. With optimize=True, indices are reordered for
+    vertex cache locality.
+    """
+
+    def __init__(self, generator: str = "caddie", quantize: bool = False, optimize: bool = False):
+        self.gltf: Dict[str, Any] = {
+            "asset": {"version": "2.0", "generator": generator},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "accessors": [],
+            "bufferViews": [],
+            "buffers": [{"byteLength": 0}],
+        }
+        self.arrays: List[np.ndarray] = []
+        self.byte_length = 0
+        self.quantize = quantize
+        self.optimize = optimize
+        self.dequantize: Dict[int, List[float]] = {}
+
+    def add_buffer_view(self, array: np.ndarray, target: Optional[int] = None,
+                        byte_stride: Optional[int] = None) -> int:
+        array = np.ascontiguousarray(array)
+        view = {"buffer": 0, "byteOffset": self.byte_length, "byteLength": array.nbytes}
+        if target is not None:
+            view["target"] = target
+        if byte_stride is not None:
+            view["byteStride"] = byte_stride
+        self.arrays.append(array)
+        self.byte_length += array.nbytes + _pad(array.nbytes)
+        self.gltf["bufferViews"].append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def add_accessor(self, array: np.ndarray, target: Optional[int] = None, normalized: bool = False,
+                     bounds: bool = False) -> int:
+        """Accessor for an (n,) or (n, k) array in its own buffer view."""
+        elements = array.shape[1] if array.ndim > 1 else 1
+        stride = None
+        if target == ARRAY_BUFFER and array.itemsize * elements % 4:
+            # Vertex attributes must be aligned to 4 bytes, pad every element.
+            padding = _pad(array.itemsize * elements) // array.itemsize
+            padded = np.zeros((len(array), elements + padding), dtype=array.dtype)
+            padded[:, :elements] = array
+            stride = padded.itemsize * padded.shape[1]
+            view = self.add_buffer_view(padded, target, stride)
+        else:
+            view = self.add_buffer_view(array, target)
+        accessor = {
+            "bufferView": view,
+            "componentType": COMPONENT_TYPES[array.dtype],
+            "count": len(array),
+            "type": ELEMENT_TYPES[elements],
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds and len(array):
+            accessor["min"] = array.min(axis=0).reshape(-1).tolist()
+            accessor["max"] = array.max(axis=0).reshape(-1).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def add_mesh(self, mesh: Mesh) -> int:
+        positions = np.asarray(mesh.positions, dtype=np.float32)
+        normals = mesh.normals
+        indices = mesh.indices
+        if self.optimize:
+            indices, used = optimize_indices(indices, positions)
+            positions = positions[used]
+            normals = normals[used] if normals is not None else None
+
+        dequantize = None
+        if self.quantize and len(positions):
+            self.use_extension("KHR_mesh_quantization", required=True)
+            positions, dequantize = quantize_positions(positions)
+        attributes = {"POSITION": self.add_accessor(positions, ARRAY_BUFFER, bounds=True)}
+        if normals is not None:
+            if self.quantize:
+                attributes["NORMAL"] = self.add_accessor(quantize_normals(normals), ARRAY_BUFFER, normalized=True)
+            else:
+                attributes["NORMAL"] = self.add_accessor(np.asarray(normals, dtype=np.float32), ARRAY_BUFFER)
+        index_type = np.uint16 if len(positions) < 2 ** 16 else np.uint32
+        indices = np.asarray(indices, dtype=index_type).reshape(-1)
+        primitive = {
+            "attributes": attributes,
+            "indices": self.add_accessor(indices, ELEMENT_ARRAY_BUFFER),
+            "mode": 4,
+        }
+        entry: Dict[str, Any] = {"primitives": [primitive]}
+        if mesh.name:
+            entry["name"] = mesh.name
+        self.gltf["meshes"].append(entry)
+        index = len(self.gltf["meshes"]) - 1
+        if dequantize is not None:
+            self.dequantize[index] = dequantize
+        return index
+
+    def add_node(self, mesh: Optional[int] = None, matrix: Optional[Sequence[float]] = None,
+                 children: Optional[List[int]] = None, root: bool = False, **properties) -> int:
+        node: Dict[str, Any] = dict(properties)
+        if mesh is not None and mesh in self.dequantize and children:
+            # The dequantization transform belongs to the mesh only, children must not inherit it.
+            children = [self.add_node(mesh)] + list(children)
+            mesh = None
+        if mesh is not None:
+            node["mesh"] = mesh
+            if mesh in self.dequantize:
+                matrix = self.dequantize[mesh] if matrix is None else multiply_matrices(matrix, self.dequantize[mesh])
+        if matrix is not None:
+            node["matrix"] = [float(v) for v in matrix]
+        if children:
+            node["children"] = children
+        self.gltf["nodes"].append(node)
+        index = len(self.gltf["nodes"]) - 1
+        if root:
+            self.gltf["scenes"][0]["nodes"].append(index)
+        return index
+
+    def add_lod_node(self, meshes: Sequence[int], matrix: Optional[Sequence[float]] = None,
+                     screen_coverage: Optional[Sequence[float]] = None) -> int:
+        """
+        A node showing meshes[0], with the other meshes (in decreasing detail) as its
+        MSFT_lod levels. Only the returned node belongs in the scene hierarchy.
+        """
+        lods = [self.add_node(mesh, matrix) for mesh in meshes[1:]]
+        properties: Dict[str, Any] = {}
+        if lods:
+            self.use_extension("MSFT_lod")
+            properties["extensions"] = {"MSFT_lod": {"ids": lods}}
+            if screen_coverage is not None:
+                properties["extras"] = {"MSFT_screencoverage": list(screen_coverage)}
+        return self.add_node(meshes[0], matrix, **properties)
+
+    def use_extension(self, name: str, required: bool = False):
+        used = self.gltf.setdefault("extensionsUsed", [])
+        if name not in used:
+            used.append(name)
+        if required:
+            required_list = self.gltf.setdefault("extensionsRequired", [])
+            if name not in required_list:
+                required_list.append(name)
+
+    def write(self, file: BinaryIO) -> int:
+        """Write the GLB container to file, returns the number of bytes written."""
+        self.gltf["buffers"][0]["byteLength"] = self.byte_length
+        gltf = {key: value for key, value in self.gltf.items() if value != []}
+        if not self.byte_length:
+            del gltf["buffers"]
+        header = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        header += b" " * _pad(len(header))
+        total = 12 + 8 + len(header) + (8 + self.byte_length if self.byte_length else 0)
+
+        file.write(struct.pack("<III", GLB_MAGIC, GLB_VERSION, total))
+        file.write(struct.pack("<II", len(header), CHUNK_JSON))
+        file.write(header)
+        if self.byte_length:
+            file.write(struct.pack("<II", self.byte_length, CHUNK_BIN))
+            for array in self.arrays:
+                file.write(memoryview(array).cast("B"))
+                file.write(b"\0" * _pad(array.nbytes))
+        return total
+
+
+def read_glb(data: bytes):
+    """The glTF JSON and the binary chunk of a GLB container."""
+    magic, version, length = struct.unpack_from("<III", data, 0)
+    if magic != GLB_MAGIC or version != GLB_VERSION:
+        raise ValueError("Not a glTF 2.0 binary container")
+    json_length, _ = struct.unpack_from("<II", data, 12)
+    gltf = json.loads(data[20:20 + json_length])
+    binary = b""
+    if 20 + json_length < length:
+        bin_length, _ = struct.unpack_from("<II", data, 20 + json_length)
+        binary = data[28 + json_length:28 + json_length + bin_length]
+    return gltf, binary
@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    # Insert two zero bits between each of the lower 10 bits.
+    values = values.astype(np.uint32) & 0x3FF
+    values = (values | (values << 16)) & 0x030000FF
+    values = (values | (values << 8)) & 0x0300F00F
+    values = (values | (values << 4)) & 0x030C30C3
+    return (values | (values << 2)) & 0x09249249
+
+
+def morton_codes(points: np.ndarray) -> np.ndarray:
+    """30 bit Morton (Z-order) codes of (n, 3) points within their bounding box."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if not len(points):
+        return np.empty(0, dtype=np.uint32)
+    low = points.min(axis=0)
+    extent = points.max(axis=0) - low
+    cells = np.floor((points - low) / np.where(extent > 0, extent, 1) * 1023).astype(np.uint32)
+    return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1) | (_spread_bits(cells[:, 2]) << 2)
+
+
+def morton_order(points: np.ndarray) -> np.ndarray:
+    """
+    Indices of (n, 3) points sorted along a Morton curve, so that neighbours in the
+    result are close in space. Points in the same cell keep their order.
+    """
+    return np.argsort(morton_codes(points), kind="stable")
@@ -8,6 +8,7 @@ from caddie.ladybug_geometry.geometry2d import Point2D, Vector2D
 from caddie.ladybug_geometry.geometry3d import Vector3D, Point3D
 from caddie.ladybug_geometry.geometry3d.plane import Plane as LPlane
 
+from caddie.fingerprint import digest
 from caddie.types.convert_to_gp import to_gp_Ax2, to_gp_Ax3, to_gp_Pnt, to_gp_Dir, to_gp_Vec
 
 AXIS_X = Vector3D(1, 0, 0)
@@ -113,6 +114,9 @@ class Plane:
     def y(self) -> Vector3D:
         return self.__plane.y
 
+    def fingerprint(self, tolerance: Optional[float] = None) -> str:
+        return digest("Plane", self.o, self.n, self.x, tolerance=tolerance)
+
     def copy(self) -> 'Plane':
         return Plane(self, self.__plane.o.copy(), self.__plane.n.copy(), self.__plane.x.copy())
 
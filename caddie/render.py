@@ -2,31 +2,277 @@ import base64
 import json
 import math
 import tempfile
+import io
+import itertools
 import os
+from typing import Optional, Sequence, BinaryIO, Tuple, List
+
+import numpy as np
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepLib import BRepLib_ToolTriangulatedShape
 from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
 from OCC.Core.BRepTools import breptools
 from OCC.Core.Message import Message_ProgressRange
+from OCC.Core.StlAPI import StlAPI_Writer
 from OCC.Core.RWGltf import RWGltf_WriterTrsfFormat, RWGltf_CafWriter
 from OCC.Core.TColStd import TColStd_IndexedDataMapOfStringString
 from OCC.Core.TCollection import TCollection_AsciiString, TCollection_ExtendedString
 from OCC.Core.TDocStd import TDocStd_Document
+from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods
 from OCC.Core.XCAFDoc import XCAFDoc_DocumentTool
 from OCC.Core.IFSelect import IFSelect_RetDone, IFSelect_ItemsByEntity
 
+from caddie.cache import ShapeCache
+from caddie.gltf import GlbWriter, Mesh, merge_meshes, Z_UP_TO_Y_UP
+from caddie.trace import span
+from caddie.types.convert_to_internal import estimate_size
+
+
+# Faces remembered by the tessellator, records with forgotten faces are re-meshed.
+MAX_STAMPED_FACES = 1 << 20
+
+
+class Tessellator:
+    """
+    Meshes shapes in parallel and remembers the deflections each shape was meshed with.
+    Triangulations stay attached to the faces, so meshing a shape again at the same level,
+    or any located instance of it, is free. Any other shape is cleared and re-meshed, since
+    BRepMesh keeps existing triangulations that are finer than requested, except when refining
+    a shape recorded at a coarser level.
+
+    Faces are stamped every time they are meshed. A record is only valid while all faces
+    of its shape still carry its stamp, so meshing a shape that shares faces with a recorded
+    one invalidates that record.
+    """
+
+    def __init__(self, parallel: bool = True):
+        self.parallel = parallel
+        self.levels = ShapeCache(cost=lambda entry: estimate_size(entry[0]))
+        self.stamps = ShapeCache(max_cost=MAX_STAMPED_FACES)
+        self.__counter = itertools.count(1)
+
+    @staticmethod
+    def key(a_shape) -> int:
+        return hash(a_shape.Located(TopLoc_Location()))
+
+    @staticmethod
+    def face_keys(a_shape) -> List[int]:
+        keys = []
+        explorer = TopExp_Explorer(a_shape, TopAbs_FACE)
+        while explorer.More():
+            keys.append(Tessellator.key(explorer.Current()))
+            explorer.Next()
+        return keys
+
+    def level(self, a_shape) -> Optional[Tuple[float, float]]:
+        """The (linear, angular) deflection the shape is currently meshed with, if known."""
+        entry = self.levels.get(self.key(a_shape))
+        if entry is None or not entry[0].IsPartner(a_shape):
+            return None
+        _, level, faces, stamp = entry
+        if any(self.stamps.get(face) != stamp for face in faces):
+            return None
+        return level
+
+    def mesh(self, a_shape, linear_deflect=0.1, angular_deflect=0.5, refine: bool = False) -> bool:
+        """
+        Mesh the shape unless it already is at this level, returns whether it was meshed.
+
+        With refine, a shape recorded at a coarser level is meshed incrementally on top of its
+        triangulation instead of being cleared first.
+        """
+        level = linear_deflect, angular_deflect
+        current = self.level(a_shape)
+        with span("BRepMesh_IncrementalMesh", linear_deflect=linear_deflect, angular_deflect=angular_deflect) as s:
+            if current == level:
+                s.set(cache="hit")
+                return False
+            refining = refine and current is not None and current[0] >= linear_deflect and \
+                current[1] >= angular_deflect
+            s.set(cache="miss", refine=refining)
+            if not refining:
+                breptools.Clean(a_shape)
+            msh_algo = BRepMesh_IncrementalMesh(a_shape, linear_deflect, True, angular_deflect, self.parallel)
+
+            msh_algo.Perform()
+            s.shapes([a_shape])
+
+        stamp = next(self.__counter)
+        faces = self.face_keys(a_shape)
+        for face in faces:
+            self.stamps.put(face, stamp)
+        self.levels.put(self.key(a_shape), (a_shape, level, faces, stamp))
+        return True
+
+    def clear(self):
+        self.levels.clear()
+        self.stamps.clear()
+
+
+tessellator = Tessellator()
+
+
+def mesh_shape(a_shape, linear_deflect=0.1, angular_deflect=0.5) -> bool:
+    return tessellator.mesh(a_shape, linear_deflect, angular_deflect)
+
+
+def write_stl_file(a_shape, stl_filename, linear_deflect=0.1, angular_deflect=0.5, ascii_mode=False):
+    """STL export sharing the triangulation of the tessellator."""
+    mesh_shape(a_shape, linear_deflect, angular_deflect)
+    writer = StlAPI_Writer()
+    writer.SetASCIIMode(ascii_mode)
+    with span("StlAPI_Writer"):
+        if not writer.Write(a_shape, stl_filename):
+            raise IOError("Error while writing shape to STL file.")
+
+
+def triangulation_to_mesh(a_shape, name: Optional[str] = None) -> Mesh:
+    """Collect the triangulations of all faces of a meshed shape into a single Mesh."""
+    parts = []
+    explorer = TopExp_Explorer(a_shape, TopAbs_FACE)
+    while explorer.More():
+        face = topods.Face(explorer.Current())
+        explorer.Next()
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation(face, location)
+        if triangulation is None:
+            continue
+        trsf = location.Transformation()
+        reversed_face = face.Orientation() == TopAbs_REVERSED
+        if not triangulation.HasNormals():
+            BRepLib_ToolTriangulatedShape.ComputeNormals(face, triangulation)
 
-def write_gltf_file(a_shape, gltf_filename, linear_deflect=0.1, angular_deflect=0.5):
-    """ocaf based ply exporter"""
+        node_count = triangulation.NbNodes()
+        face_positions = np.empty((node_count, 3), dtype=np.float32)
+        face_normals = np.empty((node_count, 3), dtype=np.float32)
+        for i in range(node_count):
+            p = triangulation.Node(i + 1).Transformed(trsf)
+            n = triangulation.Normal(i + 1).Transformed(trsf)
+            face_positions[i] = p.X(), p.Y(), p.Z()
+            face_normals[i] = n.X(), n.Y(), n.Z()
+        if reversed_face:
+            face_normals *= -1
+
+        # Poly_Triangulation numbers nodes from 1.
+        face_indices = np.empty((triangulation.NbTriangles(), 3), dtype=np.int64)
+        for i in range(len(face_indices)):
+            n1, n2, n3 = triangulation.Triangle(i + 1).Get()
+            face_indices[i] = (n1 - 1, n3 - 1, n2 - 1) if reversed_face else (n1 - 1, n2 - 1, n3 - 1)
+
+        parts.append(Mesh(face_positions, face_indices, face_normals))
+    return merge_meshes(parts, name)
+
+
+def location_matrix(location: TopLoc_Location) -> list:
+    """The location as a column-major 4x4 glTF matrix."""
+    trsf = location.Transformation()
+    return [
+        trsf.Value(row, col) if row <= 3 else float(col == 4)
+        for col in range(1, 5) for row in range(1, 5)
+    ]
+
+
+def write_glb(writer: GlbWriter, file: Optional[BinaryIO] = None) -> Optional[bytes]:
+    if file is not None:
+        writer.write(file)
+        return None
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def shape_to_glb(shape, file: Optional[BinaryIO] = None, linear_deflect=0.01, angular_deflect=0.125,
+                 locations: Optional[Sequence[TopLoc_Location]] = None, quantize: bool = False) -> Optional[bytes]:
+    """
+    Mesh the shape and pack its triangulation into a binary glTF (GLB) container,
+    written to file, or returned as bytes when no file is given.
+
+    With locations, the shape is written as one mesh with an instance node per location.
+    With quantize, vertex attributes are quantized and indices reordered (see GlbWriter).
+    Coordinates are in model units, the root node turns the Z-up model into Y-up glTF.
+    """
+    mesh_shape(shape, linear_deflect, angular_deflect)
+    with span("GlbWriter", quantize=quantize):
+        writer = GlbWriter(quantize=quantize, optimize=quantize)
+        mesh = writer.add_mesh(triangulation_to_mesh(shape))
+        if locations is None:
+            children = [writer.add_node(mesh)]
+        else:
+            children = [writer.add_node(mesh, location_matrix(location)) for location in locations]
+        writer.add_node(matrix=Z_UP_TO_Y_UP, children=children, root=True)
+        return write_glb(writer, file)
+
+
+# (linear, angular) deflections, from the finest to the coarsest level.
+LOD_LEVELS = ((0.01, 0.125), (0.05, 0.25), (0.2, 0.5))
+
+
+def shape_to_lod_meshes(shape, levels: Sequence[Tuple[float, float]] = LOD_LEVELS) -> List[Mesh]:
+    """
+    Mesh the shape at every level and return the meshes in the order of levels.
+
+    This is one BRepMesh pass per level, from coarse to fine so that the finest triangulation
+    stays attached to the shape. Only the coarsest level starts from a cleared shape, every
+    finer level refines the triangulation of the previous one instead of meshing from scratch.
+    """
+    meshes = {}
+    for index in sorted(range(len(levels)), key=lambda i: levels[i], reverse=True):
+        tessellator.mesh(shape, *levels[index], refine=bool(meshes))
+        meshes[index] = triangulation_to_mesh(shape, f"LOD{index}")
+    return [meshes[index] for index in range(len(levels))]
+
+
+def shape_to_lod_glb(shape, file: Optional[BinaryIO] = None,
+                     levels: Sequence[Tuple[float, float]] = LOD_LEVELS,
+                     screen_coverage: Optional[Sequence[float]] = None,
+                     locations: Optional[Sequence[TopLoc_Location]] = None,
+                     quantize: bool = False) -> Tuple[Optional[bytes], List[int]]:
+    """
+    Like shape_to_glb, with one mesh per level of detail (levels are ordered from the finest
+    to the coarsest) linked through the MSFT_lod extension. Viewers without support for the
+    extension show the finest level.
+
+    Returns the GLB (None when written to file) and the number of triangles of every level.
+    """
+    with span("shape_to_lod_meshes", levels=len(levels)) as s:
+        lod_meshes = shape_to_lod_meshes(shape, levels)
+        triangles = [mesh.triangle_count for mesh in lod_meshes]
+        s.set(triangles=triangles)
+
+    writer = GlbWriter(quantize=quantize, optimize=quantize)
+    meshes = [writer.add_mesh(mesh) for mesh in lod_meshes]
+    matrices = [None] if locations is None else [location_matrix(location) for location in locations]
+    children = [writer.add_lod_node(meshes, matrix, screen_coverage) for matrix in matrices]
+    writer.add_node(matrix=Z_UP_TO_Y_UP, children=children, root=True)
+    with span("GlbWriter", quantize=quantize):
+        return write_glb(writer, file), triangles
+
+
+def write_gltf_file(a_shape, gltf_filename, linear_deflect=0.1, angular_deflect=0.5,
+                    locations: Optional[Sequence[TopLoc_Location]] = None):
+    """
+    ocaf based ply exporter
+
+    With locations, a_shape is meshed once and written as one mesh referenced by an
+    instance node per location (see caddie.shape3d.pattern.Pattern.locations).
+    """
     # create a document
     doc = TDocStd_Document("pythonocc-doc-gltf-export")
     shape_tool = XCAFDoc_DocumentTool.ShapeTool(doc.Main())
 
-    # mesh shape
-    breptools.Clean(a_shape)
-    msh_algo = BRepMesh_IncrementalMesh(a_shape, linear_deflect, True, angular_deflect, False)
-
-    msh_algo.Perform()
+    mesh_shape(a_shape, linear_deflect, angular_deflect)
 
-    shape_tool.AddShape(a_shape)
+    if locations is None:
+        shape_tool.AddShape(a_shape)
+    else:
+        assembly = shape_tool.NewShape()
+        prototype = shape_tool.AddShape(a_shape, False)
+        for location in locations:
+            shape_tool.AddComponent(assembly, prototype, location)
+        shape_tool.UpdateAssemblies()
 
     # metadata
     a_file_info = TColStd_IndexedDataMapOfStringString()
@@ -36,17 +282,19 @@ def write_gltf_file(a_shape, gltf_filename, linear_deflect=0.1, angular_deflect=
 
     rwgltf_writer = RWGltf_CafWriter(gltf_filename, False)
 
-    status = rwgltf_writer.Perform(doc, a_file_info, Message_ProgressRange())
+    with span("RWGltf_CafWriter"):
+        status = rwgltf_writer.Perform(doc, a_file_info, Message_ProgressRange())
 
     if status != IFSelect_RetDone:
         raise IOError("Error while writing shape to STEP file.")
 
 
-def shape_to_gltf(shape, linear_deflect=0.01, angular_deflect=0.125):
+def shape_to_gltf(shape, linear_deflect=0.01, angular_deflect=0.125,
+                  locations: Optional[Sequence[TopLoc_Location]] = None):
     # Create a temporary directory
     with tempfile.TemporaryDirectory() as tmpdirname:
         tmp_src = os.path.join(tmpdirname, 'box.gltf')
-        write_gltf_file(shape, tmp_src, linear_deflect, angular_deflect)
+        write_gltf_file(shape, tmp_src, linear_deflect, angular_deflect, locations)
         with open(tmp_src, "rb") as f2:
             dat = f2.read()
             gltf_data = json.loads(dat)
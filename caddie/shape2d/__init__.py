@@ -3,10 +3,11 @@ from typing import Any, Union
 
 from OCC.Core.TopoDS import TopoDS_Compound, TopoDS_Shape
 
-from caddie.shape2d.shapes import Text
-
+# Defined before importing shapes, which use it as the default fingerprint tolerance.
 TOL = 1e-5
 
+from caddie.shape2d.shapes import Text  # noqa: E402
+
 @dataclass
 class Shape2D:
     compound: Union[
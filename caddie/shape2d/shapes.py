@@ -1,6 +1,8 @@
 from enum import Enum
 from typing import Union, Literal
+from caddie.fingerprint import digest
 from caddie.ladybug_geometry.geometry2d import Point2D, Arc2D, Polyline2D, LineSegment2D, Polygon2D
+from caddie.shape2d import TOL
 
 TYPES = Union[
     Polygon2D,
@@ -25,7 +27,13 @@ class Face:
         self.shape = shape
 
     def __hash__(self) -> int:
-        return hash(tuple(s.__hash__() for s in self.shape))
+        return hash((self.mode, tuple(s.__hash__() for s in self.shape)))
+
+    def fingerprint(self, tolerance: float = TOL) -> str:
+        """
+        Stable digest of the mode, primitive types and coordinates quantized to tolerance.
+        """
+        return digest("Face", self.mode, self.shape, tolerance=tolerance)
 
 
 class Sketch:
@@ -35,14 +43,32 @@ class Sketch:
     def __hash__(self) -> int:
         return hash(tuple(s.__hash__() for s in self.shapes))
 
+    def fingerprint(self, tolerance: float = TOL) -> str:
+        """
+        Stable digest of all faces, usable as a cache key across processes.
+        """
+        return digest("Sketch", self.shapes, tolerance=tolerance)
+
+
+ASPECT = Literal['REGULAR', 'BOLD', 'ITALIC', 'BOLD_ITALIC']
+
 
 class Text:
-    def __init__(self, txt, size: float = 12, h_align: Literal['CENTERED', 'LEFT', 'RIGHT', 'RIGHT_MARGIN'] = 'CENTERED', v_align: Literal['CENTERED', 'BOTTOM', 'TOP'] = 'CENTERED', offset: Point2D = Point2D()):
+    def __init__(self, txt, size: float = 12, h_align: Literal['CENTERED', 'LEFT', 'RIGHT', 'RIGHT_MARGIN'] = 'CENTERED', v_align: Literal['CENTERED', 'BOTTOM', 'TOP'] = 'CENTERED', offset: Point2D = Point2D(),
+                 font: str = "Arial", aspect: ASPECT = 'BOLD'):
         self.txt = txt
         self.size = size
         self.h_align = h_align
         self.v_align = v_align
         self.offset = offset
+        self.font = font
+        self.aspect = aspect
 
     def __hash__(self):
-        return hash((self.txt, self.size, self.h_align, self.v_align, self.offset))
+        return hash((self.txt, self.size, self.h_align, self.v_align, self.offset, self.font, self.aspect))
+
+    def fingerprint(self, tolerance: float = TOL) -> str:
+        return digest(
+            "Text", self.txt, self.size, self.h_align, self.v_align, self.offset, self.font, self.aspect,
+            tolerance=tolerance
+        )
@@ -1,20 +1,27 @@
 import inspect
-from typing import Tuple
+from itertools import groupby
+from typing import Tuple, Optional, List, Dict, Callable, Any
 
 from OCC.Core.BRep import BRep_Builder
 from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Fuse, BRepAlgoAPI_Cut
 from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakePolygon, BRepBuilderAPI_MakeEdge, BRepBuilderAPI_MakeWire, \
     BRepBuilderAPI_MakeFace
-from OCC.Core.TopoDS import TopoDS_Compound, TopoDS_Face
+from OCC.Core.TopoDS import TopoDS_Compound, TopoDS_Face, TopoDS_Shape
 from OCC.Core.gp import gp_Circ
 from caddie.ladybug_geometry.geometry2d import Arc2D, Polyline2D, Polygon2D, LineSegment2D
 from caddie.ladybug_geometry.geometry3d import Point3D
+from caddie.ladybug_geometry import boolean as pb
 
+from caddie.cache import ShapeCache
 from caddie.plane import AXIS_Z, AXIS_X
 from caddie.shape2d import Shape2DBuilder, TOL, Shape2D
 from caddie.shape2d.shapes import Face, Sketch, MODE, Text
 from caddie.shape2d.text import TextBuilder
+from caddie.trace import span
+from caddie.types.boolean import boolean_op
 from caddie.types.convert_to_gp import to_gp_Pnt, to_gp_Ax2
+from caddie.types.convert_to_internal import estimate_size, to_bb
+from caddie.types.serialize import disk_cached
 
 
 def create_compound_from_shapes(shapes):
@@ -32,24 +39,181 @@ def create_compound_from_shapes(shapes):
     return compound
 
 
+def as_polygon(face: Face, tolerance: float) -> Optional[Polygon2D]:
+    """
+    The face as a single Polygon2D, or None if the face has curved or open boundaries.
+    """
+    if face.mode not in (MODE.ADD, MODE.SUB) or len(face.shape) != 1:
+        return None
+    shape = face.shape[0]
+    if type(shape) is Polygon2D:
+        return shape
+    if type(shape) is Polyline2D and shape.is_closed(tolerance):
+        return Polygon2D(shape.vertices[:-1])
+    return None
+
+
+def resolve_polygons(faces: Tuple[Face, ...], polygons: List[Polygon2D],
+                     tolerance: float) -> List[Tuple[Polygon2D, List[Polygon2D]]]:
+    """
+    Resolve ADD/SUB polygons in 2D, one polygon boolean per run of equal modes.
+    Returns (boundary, holes) for every resulting face.
+
+    The polygon booleans scale badly with the number of faces, see SketchBuilder.polygon_fast_path.
+    """
+    polygons = Polygon2D.snap_polygons(polygons, tolerance)
+    bool_tolerance = tolerance / 100
+    result = None
+    idx = 0
+    for mode, group in groupby(faces, key=lambda f: f.mode):
+        run = [polygons[idx + i]._to_bool_poly() for i, _ in enumerate(group)]
+        idx += len(run)
+        if result is None:
+            # A leading SUB face acts as the base shape, like in the boolean builds.
+            result = run.pop(0) if mode == MODE.SUB else None
+            if not run:
+                continue
+        run_poly = pb.union_all(run, bool_tolerance)
+        if result is None:
+            result = run_poly
+        elif mode == MODE.ADD:
+            result = pb.union(result, run_poly, bool_tolerance)
+        else:
+            result = pb.difference(result, run_poly, bool_tolerance)
+
+    # Regions are even-odd filled and never cross, so a region nested in an odd
+    # number of other regions is a hole in the smallest of them.
+    regions = sorted(Polygon2D._from_bool_poly(result), key=lambda r: r.area, reverse=True)
+    parents = []
+    for i, region in enumerate(regions):
+        point = region._point_in_polygon(tolerance)
+        containers = [j for j in range(i) if regions[j].is_point_inside_bound_rect(point)]
+        parents.append(containers[-1] if len(containers) % 2 == 1 else None)
+
+    faces_with_holes = {i: (r, []) for i, r in enumerate(regions) if parents[i] is None}
+    for i, parent in enumerate(parents):
+        if parent is not None:
+            faces_with_holes[parent][1].append(regions[i])
+    return list(faces_with_holes.values())
+
+
+def overlapping_pairs(boxes: List[Tuple[float, float, float, float]]) -> List[Tuple[int, int]]:
+    """
+    Index pairs of overlapping (xmin, ymin, xmax, ymax) boxes, by sweeping along x.
+    """
+    pairs = []
+    active = []
+    for i in sorted(range(len(boxes)), key=lambda k: boxes[k][0]):
+        xmin, ymin, xmax, ymax = boxes[i]
+        active = [j for j in active if boxes[j][2] >= xmin]
+        for j in active:
+            if boxes[j][1] <= ymax and ymin <= boxes[j][3]:
+                pairs.append((j, i))
+        active.append(i)
+    return pairs
+
+
+class Islands:
+    """
+    Disjoint pieces of a sketch under construction, each with its bounding box.
+    Booleans only run between pieces whose boxes overlap, faces that touch nothing
+    are added as they are.
+    """
+
+    def __init__(self, tolerance: float):
+        self.tolerance = tolerance
+        self.shapes: List[TopoDS_Shape] = []
+        self.boxes: List[Tuple[float, float, float, float]] = []
+
+    def box(self, shape: TopoDS_Shape) -> Tuple[float, float, float, float]:
+        bb = to_bb(shape)
+        return (
+            bb.min.x - self.tolerance, bb.min.y - self.tolerance,
+            bb.max.x + self.tolerance, bb.max.y + self.tolerance
+        )
+
+    def fuse(self, faces: List[TopoDS_Shape]):
+        shapes = self.shapes + faces
+        boxes = self.boxes + [self.box(f) for f in faces]
+
+        cluster = list(range(len(shapes)))
+
+        def root(i):
+            while cluster[i] != i:
+                cluster[i] = cluster[cluster[i]]
+                i = cluster[i]
+            return i
+
+        for i, j in overlapping_pairs(boxes):
+            cluster[root(j)] = root(i)
+
+        members = {}
+        for i in range(len(shapes)):
+            members.setdefault(root(i), []).append(i)
+
+        self.shapes = []
+        self.boxes = []
+        for group in sorted(members.values()):
+            if len(group) == 1:
+                shape = shapes[group[0]]
+            else:
+                shape = boolean_op(
+                    BRepAlgoAPI_Fuse, [shapes[group[0]]], [shapes[i] for i in group[1:]], self.tolerance
+                )
+            self.shapes.append(shape)
+            self.boxes.append((
+                min(boxes[i][0] for i in group), min(boxes[i][1] for i in group),
+                max(boxes[i][2] for i in group), max(boxes[i][3] for i in group)
+            ))
+
+    def cut(self, tools: List[TopoDS_Shape]):
+        if not self.shapes:
+            # A leading SUB face acts as the base shape, like in the boolean builds.
+            self.shapes.append(tools[0])
+            self.boxes.append(self.box(tools[0]))
+            tools = tools[1:]
+        tool_boxes = [self.box(t) for t in tools]
+        island_count = len(self.boxes)
+        overlapping = {}
+        for i, j in overlapping_pairs(self.boxes + tool_boxes):
+            island, tool = min(i, j), max(i, j)
+            if island < island_count <= tool:
+                overlapping.setdefault(island, []).append(tools[tool - island_count])
+        for island, island_tools in overlapping.items():
+            self.shapes[island] = boolean_op(BRepAlgoAPI_Cut, [self.shapes[island]], island_tools)
+
+    def compound(self) -> TopoDS_Compound:
+        if len(self.shapes) == 1 and isinstance(self.shapes[0], TopoDS_Compound):
+            return self.shapes[0]
+        return create_compound_from_shapes(self.shapes)
+
+
 class SketchBuilder(Shape2DBuilder):
-    cache = {}
+    cache = ShapeCache(cost=lambda shape2d: estimate_size(shape2d.compound))
+    # Resolve each run of consecutive ADD/SUB faces in one multi-argument boolean
+    # instead of one boolean per face.
+    batch = False
+    # Resolve sketches made only of polygons in 2D, and build one OCC face per resulting region.
+    # The polygon booleans scale roughly cubically with the number of faces, so they are
+    # only used for sketches up to polygon_fast_path_max_faces faces. Compare with
+    # benchmarks/bench_shapes.py (polygon_sketch cases) before enabling.
+    polygon_fast_path = False
+    polygon_fast_path_max_faces = 16
+    # Only run booleans between faces whose bounding boxes overlap.
+    broad_phase = True
 
-    def __init__(self, sketch: Sketch, tolerance: float = TOL):
+    def __init__(self, sketch: Sketch, tolerance: float = TOL, batch: Optional[bool] = None):
         super().__init__()
         self.tolerance = tolerance
-        cache_key = hash(sketch)
-        if cache_key in SketchBuilder.cache:
-            self.shape2d = SketchBuilder.cache[cache_key]
+        if batch is not None:
+            self.batch = batch
+        cache_key = sketch.fingerprint(tolerance)
+        cached = SketchBuilder.cache.get(cache_key)
+        if cached is not None:
+            with span("SketchBuilder", tolerance=tolerance, cache="hit"):
+                self.shape2d = cached
         else:
-            self.dispatcher = {}
-
-            method_list = inspect.getmembers(self, predicate=inspect.ismethod)
-            for method_name, method in method_list:
-                if '__gen__' in method_name:
-                    for name, param in inspect.signature(method).parameters.items():
-                        type_hint = param.annotation
-                        self.dispatcher[type_hint] = method
+            self.dispatcher = self.dispatch_table()
 
             def is_face(s2):
                 if isinstance(s2, Sketch):
@@ -88,7 +252,47 @@ class SketchBuilder(Shape2DBuilder):
                     add_compound = algo.Shape()
                 return add_compound
 
+            def build_batched(shapes: Tuple[Face, ...]):
+                add_compound = None
+                for mode, group in groupby(shapes, key=lambda s: s.mode):
+                    new_faces = [
+                        self.__make_face([s.shape, ]) if is_face(s.shape) else build(s.shape.shapes)
+                        for s in group
+                    ]
+                    if mode == MODE.ADD:
+                        if add_compound is not None:
+                            new_faces.insert(0, add_compound)
+                        add_compound = self.__fuse_all(new_faces)
+                    elif mode == MODE.SUB:
+                        if add_compound is None:
+                            add_compound = create_compound_from_shapes([new_faces.pop(0)])
+                        if new_faces:
+                            add_compound = boolean_op(BRepAlgoAPI_Cut, [add_compound], new_faces)
+                    else:
+                        raise Exception("Not supported")
+                return add_compound
+
+            def build_islands(shapes: Tuple[Face, ...]):
+                islands = Islands(self.tolerance)
+                runs = groupby(shapes, key=lambda s: s.mode) if self.batch else ((s.mode, [s]) for s in shapes)
+                for mode, group in runs:
+                    new_faces = [
+                        self.__make_face([s.shape, ]) if is_face(s.shape) else build(s.shape.shapes)
+                        for s in group
+                    ]
+                    if mode == MODE.ADD:
+                        islands.fuse(new_faces)
+                    elif mode == MODE.SUB:
+                        islands.cut(new_faces)
+                    else:
+                        raise Exception("Not supported")
+                return islands.compound() if islands.shapes else None
+
             def build(shapes: Tuple[Face, ...]):
+                if self.broad_phase:
+                    return build_islands(shapes)
+                if self.batch:
+                    return build_batched(shapes)
                 add_compound = None
                 for s in shapes:
                     if s.mode == MODE.ADD:
@@ -99,15 +303,99 @@ class SketchBuilder(Shape2DBuilder):
                         raise Exception("Not supported")
                 return add_compound
 
-            self.shape2d = Shape2D(build(sketch.shapes))
+            with span("SketchBuilder", tolerance=tolerance, cache="miss", faces=len(sketch.shapes)) as s:
+                polygons = self.__polygons(sketch)
+                if polygons is not None:
+                    s.set(polygon_fast_path=True)
+                    self.shape2d = Shape2D(
+                        disk_cached(cache_key, lambda: self.__build_polygons(sketch.shapes, polygons))
+                    )
+                else:
+                    self.shape2d = Shape2D(
+                        disk_cached(cache_key, lambda: build(sketch.shapes))
+                    )
+                s.shapes(output=self.shape2d.compound)
             SketchBuilder.cache[cache_key] = self.shape2d
 
+    @classmethod
+    def dispatch_table(cls) -> Dict[type, Callable[['SketchBuilder', Any], Any]]:
+        """
+        Primitive type -> generator table, built once per class from the __gen__ methods
+        and the generators added with register_primitive.
+        """
+        table = cls.__dict__.get('_dispatch_table')
+        if table is None:
+            table = {}
+            for klass in reversed(cls.__mro__):
+                for name, member in vars(klass).items():
+                    if '__gen__' in name and inspect.isfunction(member):
+                        primitive_param = list(inspect.signature(member).parameters.values())[1]
+                        table[primitive_param.annotation] = member
+                table.update(vars(klass).get('_registered_generators', {}))
+            cls._dispatch_table = table
+        return table
+
+    @classmethod
+    def register_primitive(cls, primitive_type: type,
+                           generator: Optional[Callable[['SketchBuilder', Any], Any]] = None):
+        """
+        Register a generator for a custom primitive type, for this class and its subclasses.
+        The generator is called with the builder and the primitive, and returns an edge, wire,
+        face or compound. Can be used as a decorator when generator is omitted.
+        """
+        if generator is None:
+            return lambda func: cls.register_primitive(primitive_type, func) or func
+
+        if '_registered_generators' not in cls.__dict__:
+            cls._registered_generators = {}
+        cls._registered_generators[primitive_type] = generator
+
+        stale = [cls]
+        while stale:
+            klass = stale.pop()
+            if '_dispatch_table' in klass.__dict__:
+                del klass._dispatch_table
+            stale.extend(klass.__subclasses__())
+
+    def __polygons(self, sketch: Sketch) -> Optional[List[Polygon2D]]:
+        if not self.polygon_fast_path or not 0 < len(sketch.shapes) <= self.polygon_fast_path_max_faces:
+            return None
+        default = SketchBuilder.dispatch_table()
+        if any(self.dispatcher.get(t) is not default[t] for t in (Polygon2D, Polyline2D)):
+            return None
+        polygons = []
+        for face in sketch.shapes:
+            polygon = as_polygon(face, self.tolerance) if isinstance(face, Face) else None
+            if polygon is None:
+                return None
+            polygons.append(polygon)
+        return polygons
+
+    def __build_polygons(self, faces: Tuple[Face, ...], polygons: List[Polygon2D]):
+        built_faces = []
+        for boundary, holes in resolve_polygons(faces, polygons, self.tolerance):
+            # __gen__polygon orients wires clockwise, so holes are reversed to be counter-clockwise.
+            face_builder = BRepBuilderAPI_MakeFace(self.__gen__polygon(boundary))
+            for hole in holes:
+                if hole.is_clockwise:
+                    hole = hole.reverse()
+                face_builder.Add(self.__gen__polyline(Polyline2D.from_polygon(hole), True))
+            built_faces.append(face_builder.Face())
+        return create_compound_from_shapes(built_faces)
+
+    def __generator(self, primitive_type: type):
+        table = self.dispatcher
+        for klass in primitive_type.__mro__:
+            if klass in table:
+                return table[klass]
+        raise NotImplementedError(f"No generator registered for {primitive_type}")
+
     def __make_face(self, s):
         shapes = []
         for x in s:
             all_built_shapes = []
             for y in x:
-                shape = self.dispatcher[type(y)](y)
+                shape = self.__generator(type(y))(self, y)
                 all_built_shapes.append(shape)
 
                 if isinstance(shape, TopoDS_Face) or isinstance(shape, TopoDS_Compound):
@@ -122,6 +410,9 @@ class SketchBuilder(Shape2DBuilder):
                     face = face_builder.Face()
                     shapes.append(face)
 
+        if self.batch:
+            return self.__fuse_all(shapes)
+
         add_compound = None
         for s in shapes:
             if add_compound is None:
@@ -140,6 +431,11 @@ class SketchBuilder(Shape2DBuilder):
 
         return add_compound
 
+    def __fuse_all(self, shapes: List):
+        if len(shapes) == 1:
+            return create_compound_from_shapes(shapes)
+        return boolean_op(BRepAlgoAPI_Fuse, shapes[:1], shapes[1:], self.tolerance)
+
     def __gen__polyline(self, polyline: Polyline2D, is_polygon: bool = False):
         poly = BRepBuilderAPI_MakePolygon()
         local_vertices = [to_gp_Pnt(Point3D.from_point2d(p)) for p in polyline.vertices]
@@ -1,68 +1,311 @@
+import threading
+from typing import Callable, Dict, List, Tuple, Optional
+
+from OCC.Core.Font import (Font_BRepFont, Font_BRepTextBuilder, Font_FontMgr, Font_FA_Regular, Font_FA_Bold,
+                           Font_FA_Italic, Font_FA_BoldItalic)
+from OCC.Core.Graphic3d import Graphic3d_HTA_LEFT, Graphic3d_VTA_BOTTOM
+from OCC.Core.TCollection import TCollection_AsciiString
 from OCC.Core.TopLoc import TopLoc_Location
-from OCC.Core.TopoDS import TopoDS_Shape
-from OCC.Core.Addons import text_to_brep, Font_FA_Regular, Font_FA_Bold
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.TopoDS import TopoDS_Shape, TopoDS_Compound
+from OCC.Core.gp import gp_Ax3, gp_Trsf, gp_Vec
 
+from caddie.cache import ShapeCache
+from caddie.fingerprint import digest
 from caddie.plane import Plane, Translation, AXIS_Z, AXIS_X, ORIGIN
 from caddie.shape2d import Shape2DBuilder, TOL, Shape2D
-from caddie.shape2d.shapes import Text
-from caddie.types.convert_to_internal import to_bb, shape_to_convex
+from caddie.shape2d.shapes import Text, ASPECT
+from caddie.types.convert_to_internal import to_bb, shape_to_convex, estimate_size
+from caddie.types.serialize import disk_cached
+from caddie.trace import span
 from caddie.ladybug_geometry.geometry2d import Polygon2D
 
 
+ASPECTS = {
+    'REGULAR': Font_FA_Regular,
+    'BOLD': Font_FA_Bold,
+    'ITALIC': Font_FA_Italic,
+    'BOLD_ITALIC': Font_FA_BoldItalic,
+}
+
+
+class FontRegistry:
+    """
+    Fonts registered from files with the OCC font manager, and persistent font handles
+    per (font, aspect, size), created once and reused by every text build.
+
+    A Font_BRepFont is not thread safe, rendering with a handle holds its lock.
+    """
+
+    def __init__(self):
+        self.__fonts: Dict[Tuple[str, int, float], Tuple[Font_BRepFont, threading.Lock]] = {}
+        self.__paths: Dict[Tuple[str, int], str] = {}
+        self.__lock = threading.Lock()
+        # Called with the family name whenever a font file is registered.
+        self.listeners: List[Callable[[str], None]] = []
+
+    def register(self, path: str) -> str:
+        """
+        Register the font file at path, overriding any system font with the same family name.
+        Returns the family name to use as Text.font.
+        """
+        system_font = Font_FontMgr.GetInstance().CheckFont(path)
+        if system_font is None:
+            raise ValueError(f"Unable to load font {path}")
+        Font_FontMgr.GetInstance().RegisterFont(system_font, True)
+        name = system_font.FontName()
+        with self.__lock:
+            # Handles created before the registration may point to another font of the same name.
+            for key in [key for key in self.__fonts if key[0] == name]:
+                del self.__fonts[key]
+            for key in [key for key in self.__paths if key[0] == name]:
+                del self.__paths[key]
+        for listener in self.listeners:
+            listener(name)
+        return name
+
+    def font_path(self, font_name: str, aspect) -> str:
+        """
+        The file the font manager resolves font_name and aspect to, empty if it has none.
+        Text built with a font is keyed on it, so registering another file under the same
+        family name does not return shapes built from the old one.
+        """
+        key = font_name, int(aspect)
+        with self.__lock:
+            path = self.__paths.get(key)
+            if path is None:
+                system_font = Font_FontMgr.GetInstance().FindFont(TCollection_AsciiString(font_name), aspect)
+                path = "" if system_font is None else system_font.FontPath(aspect) or \
+                    system_font.FontPath(Font_FA_Regular)
+                self.__paths[key] = path
+            return path
+
+    def __entry(self, font_name: str, aspect, size: float) -> Tuple[Font_BRepFont, threading.Lock]:
+        key = font_name, int(aspect), size
+        with self.__lock:
+            entry = self.__fonts.get(key)
+            if entry is None:
+                with span("Font_BRepFont", size=size):
+                    font = Font_BRepFont(font_name, aspect, size)
+                    font.SetCompositeCurveMode(False)
+                entry = font, threading.Lock()
+                self.__fonts[key] = entry
+            return entry
+
+    def font(self, font_name: str, aspect, size: float) -> Font_BRepFont:
+        return self.__entry(font_name, aspect, size)[0]
+
+    def render(self, txt: str, font_name: str, aspect, size: float) -> TopoDS_Shape:
+        """Left and bottom aligned text, laid out like text_to_brep but with the persistent handle."""
+        font, lock = self.__entry(font_name, aspect, size)
+        with lock:
+            return Font_BRepTextBuilder().Perform(font, txt, gp_Ax3(), Graphic3d_HTA_LEFT, Graphic3d_VTA_BOTTOM)
+
+    def render_glyph(self, font_name: str, aspect, size: float, char: str) -> TopoDS_Shape:
+        font, lock = self.__entry(font_name, aspect, size)
+        with lock:
+            return font.RenderGlyph(ord(char))
+
+    def advance(self, font_name: str, aspect, size: float, char: str, next_char: str) -> float:
+        """Pen advance from char to next_char, kerning included."""
+        font, lock = self.__entry(font_name, aspect, size)
+        with lock:
+            return font.AdvanceX(ord(char), ord(next_char))
+
+    def line_spacing(self, font_name: str, aspect, size: float) -> float:
+        font, lock = self.__entry(font_name, aspect, size)
+        with lock:
+            return font.LineSpacing()
+
+    def preload(self, font_name: str, aspect: ASPECT, *sizes: float):
+        for size in sizes:
+            self.font(font_name, ASPECTS[aspect], size)
+
+    def clear(self):
+        with self.__lock:
+            self.__fonts.clear()
+            self.__paths.clear()
+
+
+font_registry = FontRegistry()
+
+
+def register_font(path: str) -> str:
+    return font_registry.register(path)
+
+
+def preload_font(font_name: str, aspect: ASPECT, *sizes: float):
+    font_registry.preload(font_name, aspect, *sizes)
+
+
+class GlyphCache:
+    """
+    Glyph faces rendered once per (font, aspect, size, character), with the font
+    handles of the registry used to render them and to look up advances and kerning.
+    """
+
+    def __init__(self, registry: FontRegistry = font_registry):
+        self.glyphs = ShapeCache(cost=estimate_size)
+        self.registry = registry
+        registry.listeners.append(self.forget)
+
+    def forget(self, font_name: str):
+        """Drop the glyphs of a font, e.g. when another file is registered under its name."""
+        self.glyphs.discard(lambda key: key[0] == font_name)
+
+    def font(self, font_name: str, aspect, size: float) -> Font_BRepFont:
+        return self.registry.font(font_name, aspect, size)
+
+    def glyph(self, font_name: str, aspect, size: float, char: str) -> TopoDS_Shape:
+        key = font_name, int(aspect), size, char
+        glyph = self.glyphs.get(key)
+        if glyph is None:
+            with span("Font_BRepFont.RenderGlyph", size=size):
+                glyph = self.registry.render_glyph(font_name, aspect, size, char)
+            self.glyphs.put(key, glyph)
+        return glyph
+
+    def compose(self, txt: str, font_name: str, aspect, size: float) -> TopoDS_Shape:
+        """
+        Place located instances of the cached glyphs along the pen, advancing by the
+        font's advance and kerning metrics, like text_to_brep lays out left aligned text.
+        """
+        builder = BRep_Builder()
+        compound = TopoDS_Compound()
+        builder.MakeCompound(compound)
+
+        pen_y = 0.0
+        for line in txt.split("\n"):
+            pen_x = 0.0
+            for char, next_char in zip(line, line[1:] + "\0"):
+                glyph = self.glyph(font_name, aspect, size, char)
+                if not glyph.IsNull():
+                    trsf = gp_Trsf()
+                    trsf.SetTranslation(gp_Vec(pen_x, pen_y, 0))
+                    builder.Add(compound, glyph.Moved(TopLoc_Location(trsf)))
+                pen_x += self.registry.advance(font_name, aspect, size, char, next_char)
+            pen_y -= self.registry.line_spacing(font_name, aspect, size)
+        return compound
+
+
+class TextEntry:
+    """
+    Cached text shape. The bounding box and the hulls (per deflection) are computed
+    on first access and kept with the entry.
+    """
+
+    def __init__(self, shape2d: Shape2D):
+        self.shape2d = shape2d
+        self.bb = None
+        self.hulls: Dict[float, Polygon2D] = {}
+
+    def bounding_box(self):
+        if self.bb is None:
+            self.bb = to_bb(self.shape2d.compound)
+        return self.bb
+
+    def hull(self, deflection: float) -> Polygon2D:
+        hull = self.hulls.get(deflection)
+        if hull is None:
+            with span("shape_to_convex", deflection=deflection):
+                hull = shape_to_convex(self.shape2d.compound, deflection)
+            self.hulls[deflection] = hull
+        return hull
+
+
 class TextBuilder(Shape2DBuilder):
-    cache = {}
+    cache = ShapeCache(cost=lambda entry: estimate_size(entry.shape2d.compound))
+    glyph_cache = GlyphCache()
+    # Compose strings from cached glyphs instead of rendering every string with Font_BRepTextBuilder.
+    compose_glyphs = False
+    # Deflection used to discretize edges for the convex hull.
+    hull_deflection = 0.001
 
-    def __init__(self, text: Text, tolerance: float = TOL):
+    def __init__(self, text: Text, tolerance: float = TOL, compose_glyphs: Optional[bool] = None):
         super().__init__()
-        cache_key = hash(text)
-        if cache_key in TextBuilder.cache:
-            self.bb, self.shape2d, self.hull = TextBuilder.cache[cache_key]
+        if compose_glyphs is not None:
+            self.compose_glyphs = compose_glyphs
+        cache_key = TextBuilder.cache_key(text, self.compose_glyphs)
+        cached = TextBuilder.cache.get(cache_key)
+        if cached is not None:
+            with span("TextBuilder", cache="hit"):
+                self.entry = cached
         else:
-            text_shape: TopoDS_Shape = text_to_brep(text.txt, "Arial", Font_FA_Bold, text.size, False)
-
-            bb = to_bb(text_shape)
-
-            x_shift = 0
-            y_shift = 0
-            z_shift = -bb.min.z - bb.size.z * 0.5
-
-            if text.h_align == 'CENTERED':
-                x_shift = -bb.min.x - bb.size.x * 0.5
-            elif text.h_align == 'LEFT':
-                x_shift = -bb.min.x
-            elif text.h_align == 'RIGHT':
-                x_shift = -bb.min.x - bb.size.x
-            elif text.h_align == 'RIGHT_MARGIN':
-                x_shift = -bb.min.x * 2 - bb.size.x
-
-            if text.v_align == 'CENTERED':
-                y_shift = -bb.min.y - bb.size.y * 0.5
-            elif text.v_align == 'BOTTOM':
-                y_shift = -bb.min.y
-            elif text.v_align == 'TOP':
-                y_shift = -bb.min.y - bb.size.y
-
-            x_shift += text.offset.x
-            y_shift += text.offset.y
-
-            text_shape = text_shape.Moved(
-                TopLoc_Location(
-                    Plane(None, ORIGIN, AXIS_Z, AXIS_X).transformed(
-                        Translation(x_shift, y_shift, z_shift)
-                    ).gp_Trsf(
-                        Plane(None, ORIGIN, AXIS_Z, AXIS_X)
+            aspect = ASPECTS[text.aspect]
+
+            def build_text() -> TopoDS_Shape:
+                if self.compose_glyphs:
+                    with span("GlyphCache.compose", size=text.size, length=len(text.txt)):
+                        text_shape = TextBuilder.glyph_cache.compose(text.txt, text.font, aspect, text.size)
+                else:
+                    with span("Font_BRepTextBuilder", size=text.size, length=len(text.txt)) as s:
+                        text_shape: TopoDS_Shape = font_registry.render(text.txt, text.font, aspect, text.size)
+                        s.shapes(output=text_shape)
+
+                bb = to_bb(text_shape)
+
+                x_shift = 0
+                y_shift = 0
+                z_shift = -bb.min.z - bb.size.z * 0.5
+
+                if text.h_align == 'CENTERED':
+                    x_shift = -bb.min.x - bb.size.x * 0.5
+                elif text.h_align == 'LEFT':
+                    x_shift = -bb.min.x
+                elif text.h_align == 'RIGHT':
+                    x_shift = -bb.min.x - bb.size.x
+                elif text.h_align == 'RIGHT_MARGIN':
+                    x_shift = -bb.min.x * 2 - bb.size.x
+
+                if text.v_align == 'CENTERED':
+                    y_shift = -bb.min.y - bb.size.y * 0.5
+                elif text.v_align == 'BOTTOM':
+                    y_shift = -bb.min.y
+                elif text.v_align == 'TOP':
+                    y_shift = -bb.min.y - bb.size.y
+
+                x_shift += text.offset.x
+                y_shift += text.offset.y
+
+                text_shape = text_shape.Moved(
+                    TopLoc_Location(
+                        Plane(None, ORIGIN, AXIS_Z, AXIS_X).transformed(
+                            Translation(x_shift, y_shift, z_shift)
+                        ).gp_Trsf(
+                            Plane(None, ORIGIN, AXIS_Z, AXIS_X)
+                        )
                     )
                 )
-            )
-            self.bb = to_bb(text_shape)
-            self.shape2d = Shape2D(text_shape)
-            self.hull = shape_to_convex(text_shape, 0.001)
-            TextBuilder.cache[cache_key] = self.bb, self.shape2d, self.hull
+                return text_shape
+
+            with span("TextBuilder", cache="miss"):
+                self.entry = TextEntry(Shape2D(disk_cached(cache_key, build_text)))
+            TextBuilder.cache[cache_key] = self.entry
+        self.shape2d = self.entry.shape2d
+
+    @staticmethod
+    def cache_key(text: Text, compose_glyphs: Optional[bool] = None) -> str:
+        """
+        Fingerprint of the text, of the font file it resolves to and of the layout it is
+        built with (glyphs or whole strings).
+        """
+        if compose_glyphs is None:
+            compose_glyphs = TextBuilder.compose_glyphs
+        font_path = font_registry.font_path(text.font, ASPECTS[text.aspect])
+        return digest(text, font_path, "glyphs" if compose_glyphs else "brep")
+
+    @property
+    def bb(self):
+        return self.entry.bounding_box()
+
+    @property
+    def hull(self) -> Polygon2D:
+        return self.entry.hull(self.hull_deflection)
 
     @staticmethod
     def get_bounding_box(text: Text):
-        return TextBuilder.cache[hash(text)][0]
+        return TextBuilder(text).bb
 
     @staticmethod
-    def get_hull(text: Text) -> Polygon2D:
-        return TextBuilder.cache[hash(text)][2]
+    def get_hull(text: Text, deflection: Optional[float] = None) -> Polygon2D:
+        return TextBuilder(text).entry.hull(deflection or TextBuilder.hull_deflection)
@@ -1,7 +1,20 @@
 from dataclasses import dataclass
+from typing import Optional
 
 from OCC.Core.TopoDS import TopoDS_Shape
 
 @dataclass
 class Shape3D:
     occ_shape: "TopoDS_Shape"
+    # Digest of the inputs the shape was built from, when known.
+    source: Optional[str] = None
+
+    def fingerprint(self, tolerance: Optional[float] = None) -> str:
+        """
+        The source digest, or the identity of the underlying shape object when the
+        shape was not built from fingerprinted inputs. Identities are reused once the
+        object is garbage collected, so they must not be part of anything that outlives it.
+        """
+        if self.source is not None:
+            return self.source
+        return f"id:{id(self.occ_shape)}"
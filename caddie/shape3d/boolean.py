@@ -1,17 +1,67 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import groupby, repeat
 from typing import List, Optional, Literal, Tuple, Callable
 
 from OCC.Core.BRepAlgoAPI import (BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse)
 from OCC.Core.TopoDS import TopoDS_Shape
 
+from caddie.cache import ShapeCache
+from caddie.fingerprint import digest
+from caddie.morton import morton_order
 from caddie.shape3d import Shape3D
+from caddie.types.boolean import boolean_op, GLUE
+from caddie.trace import span
+from caddie.types.convert_to_internal import to_bb, estimate_size
+from caddie.types.serialize import shape_to_bytes, shape_from_bytes
 
 OPS = Literal["cut", "fuse"]
+REDUCTION = Literal["fold", "tree"]
+
+OP_ALGOS = {
+    "fuse": BRepAlgoAPI_Fuse,
+    "cut": BRepAlgoAPI_Cut,
+}
+
+
+def fuse_shapes(shapes: list, fuzzy_value: Optional[float], parallel: bool, glue: GLUE,
+                serialize: bool = False):
+    if serialize:
+        shapes = [shape_from_bytes(s) for s in shapes]
+    fused = boolean_op(BRepAlgoAPI_Fuse, shapes[:1], shapes[1:], fuzzy_value, parallel, glue)
+    return shape_to_bytes(fused) if serialize else fused
 
 
 class BooleanBuilder:
-    def __init__(self, sort_filter: Optional[Callable[[Tuple[Shape3D, OPS]], int]] = None):
+    """
+    Consecutive modifiers with the same operation are applied in a single boolean,
+    with all of their shapes as tools.
+
+    With reduction="tree", runs of fuses are instead reduced pairwise in a balanced tree,
+    with siblings ordered along a Morton curve of their bounding box centers. Each tree
+    level is built with executor when one is given, passing serialized BReps to process pools.
+
+    With incremental=True, intermediate results are memoized under the fingerprint of the
+    modifier prefix that produced them, so a later to_shape with the same leading modifiers
+    only replays from the first changed one (available as first_recomputed afterwards).
+    Results are stored at the end of every run of equal operations and before the last modifier.
+    Only prefixes of shapes with a source are memoized: the fingerprint of any other shape is
+    its object identity, which is reused once the shape is garbage collected.
+    """
+    prefix_cache = ShapeCache(cost=estimate_size)
+
+    def __init__(self, sort_filter: Optional[Callable[[Tuple[Shape3D, OPS]], int]] = None,
+                 parallel: bool = False, glue: GLUE = "off", fuzzy_value: Optional[float] = None,
+                 reduction: REDUCTION = "fold", executor: Optional[Executor] = None,
+                 incremental: bool = False):
         self.modifiers: List[Tuple[Shape3D, OPS]] = []
         self.sort_filter = sort_filter
+        self.parallel = parallel
+        self.glue = glue
+        self.fuzzy_value = fuzzy_value
+        self.reduction = reduction
+        self.executor = executor
+        self.incremental = incremental
+        self.first_recomputed: Optional[int] = None
 
     def add(self, shape: Shape3D, mode: OPS = "fuse"):
         self.modifiers.append((shape, mode))
@@ -24,11 +74,78 @@ class BooleanBuilder:
             key=self.sort_filter
         ) if self.sort_filter else self.modifiers
 
+        if self.incremental:
+            return self.__to_shape_incremental(sorted_mods)
+
+        self.first_recomputed = 1
+        return Shape3D(self.__apply(sorted_mods[0][0].occ_shape, sorted_mods[1:]))
+
+    def __apply(self, shape: TopoDS_Shape, modifiers: List[Tuple[Shape3D, OPS]]) -> TopoDS_Shape:
+        for op, group in groupby(modifiers, key=lambda mod: mod[1]):
+            if op not in OP_ALGOS:
+                raise ValueError(f"Unsupported boolean operation {op}")
+            tools = [mod_shape.occ_shape for mod_shape, _ in group]
+            if op == "fuse" and self.reduction == "tree":
+                shape = self.fuse_tree([shape] + tools)
+            else:
+                shape = boolean_op(OP_ALGOS[op], [shape], tools, self.fuzzy_value, self.parallel, self.glue)
+        return shape
+
+    def __to_shape_incremental(self, sorted_mods: List[Tuple[Shape3D, OPS]]) -> Shape3D:
+        prefix_keys = []
+        key = digest("Boolean", self.glue, self.fuzzy_value, self.reduction)
+        for mod_shape, op in sorted_mods:
+            if mod_shape.source is None:
+                break
+            key = digest(key, op, mod_shape)
+            prefix_keys.append(key)
+        # Results are only memoized up to the first shape without a source.
+        cacheable = len(prefix_keys)
+
+        # Checkpoints are the (exclusive) end indices of the steps that are memoized.
+        checkpoints = []
+        end = 1
+        for _, group in groupby(sorted_mods[1:], key=lambda mod: mod[1]):
+            size = len(list(group))
+            if end + size == len(sorted_mods) and size > 1:
+                checkpoints.append(end + size - 1)
+            end += size
+            checkpoints.append(end)
+
+        start = 1
         shape = sorted_mods[0][0].occ_shape
+        with span("BooleanBuilder.prefix_cache") as s:
+            for end in reversed(checkpoints):
+                if end > cacheable:
+                    continue
+                cached = BooleanBuilder.prefix_cache.get(prefix_keys[end - 1])
+                if cached is not None:
+                    shape, start = cached, end
+                    break
+            s.set(cache="hit" if start > 1 else "miss", first_recomputed=start)
+
+        self.first_recomputed = start if start < len(sorted_mods) else None
+        for end in checkpoints:
+            if end <= start:
+                continue
+            shape = self.__apply(shape, sorted_mods[start:end])
+            if end <= cacheable:
+                BooleanBuilder.prefix_cache.put(prefix_keys[end - 1], shape)
+            start = end
+        return Shape3D(shape, prefix_keys[-1] if cacheable == len(sorted_mods) else None)
+
+    def fuse_tree(self, shapes: List[TopoDS_Shape]) -> TopoDS_Shape:
+        serialize = isinstance(self.executor, ProcessPoolExecutor)
+        order = morton_order([tuple(to_bb(s).center()) for s in shapes]).tolist()
+        shapes = [shapes[i] for i in order]
+        if serialize:
+            shapes = [shape_to_bytes(s) for s in shapes]
 
-        for mod_shape, op in sorted_mods[1:]:
-            if op == "fuse":
-                shape = BRepAlgoAPI_Fuse(shape, mod_shape.occ_shape).Shape()
-            elif op == "cut":
-                shape = BRepAlgoAPI_Cut(shape, mod_shape.occ_shape).Shape()
-        return Shape3D(shape)
+        while len(shapes) > 1:
+            pairs = [shapes[i:i + 2] for i in range(0, len(shapes) - 1, 2)]
+            args = pairs, repeat(self.fuzzy_value), repeat(self.parallel), repeat(self.glue), repeat(serialize)
+            fused = list(self.executor.map(fuse_shapes, *args) if self.executor else map(fuse_shapes, *args))
+            if len(shapes) % 2:
+                fused.append(shapes[-1])
+            shapes = fused
+        return shape_from_bytes(shapes[0]) if serialize else shapes[0]
@@ -1,25 +1,49 @@
 from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakePrism
 
+from caddie.cache import ShapeCache
+from caddie.fingerprint import digest
+from caddie.plane import Plane
 from caddie.shape2d import Shape2D
 from caddie.shape3d import Shape3D
 from caddie.shape3d.section import Section
+from caddie.trace import span
+from caddie.types.convert_to_internal import estimate_size
+from caddie.types.serialize import disk_cached
 
 
 class ExtrusionBuilder:
+    """
+    Prisms are built in the XY plane, where all 2D shapes are constructed, and memoized
+    under the sketch, tolerance and distance. Extruding the same sketch in another plane
+    only moves the memoized prism into that plane.
+    """
+    cache = ShapeCache(cost=estimate_size)
+
     def __init__(self, section: Section, tolerance=0.001):
         self.section = section
         self.tolerance = tolerance
 
     def to_shape(self, distance: float) -> Shape3D:
-        shape2d: Shape2D = self.section.to_shape(self.tolerance)
+        key = digest("Extrusion", self.section.sketch_fingerprint(self.tolerance), distance, tolerance=self.tolerance)
+        prism = ExtrusionBuilder.cache.get(key)
+        with span("ExtrusionBuilder", cache="miss" if prism is None else "hit"):
+            if prism is None:
+                prism = disk_cached(key, lambda: self.__build(distance))
+                ExtrusionBuilder.cache.put(key, prism)
+            shape = self.section.plane.moved_into(prism)
+        # The plane is digested exactly: its directions are not lengths, quantizing them to
+        # the length tolerance would merge planes whose geometry differs far from the origin.
+        return Shape3D(shape, digest(key, self.section.plane))
 
-        # All 2D shapes are constructed in XY plane, move them into the provided desired plane.
-        compound_shape = self.section.plane.moved_into(shape2d.compound)
-
-        prism_maker = BRepPrimAPI_MakePrism(
-            compound_shape,
-            self.section.plane.gp_norm_distance(distance),
-            True
-        )
+    def __build(self, distance: float):
+        shape2d: Shape2D = self.section.to_shape(self.tolerance)
 
-        return Shape3D(prism_maker.Shape())
+        with span("BRepPrimAPI_MakePrism", tolerance=self.tolerance, distance=distance) as s:
+            prism_maker = BRepPrimAPI_MakePrism(
+                shape2d.compound,
+                Plane().gp_norm_distance(distance),
+                True
+            )
+            built_shape = prism_maker.Shape()
+            s.shapes([shape2d.compound], built_shape)
+        return built_shape
@@ -1,16 +1,23 @@
 from collections import defaultdict
-from typing import List
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Literal, Sequence
 
 from OCC.Core.BRepOffsetAPI import BRepOffsetAPI_ThruSections
 from OCC.Core.BRepTools import breptools
 from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_WIRE
 from OCC.Core.TopExp import TopExp_Explorer
-from OCC.Core.TopoDS import TopoDS_Compound
+from OCC.Core.TopoDS import TopoDS_Compound, topods
 
+from caddie.fingerprint import digest
+from caddie.ladybug_geometry.geometry3d import Point3D
 from caddie.shape2d import Shape2D
 from caddie.shape3d import Shape3D
 from caddie.shape3d.boolean import BooleanBuilder
 from caddie.shape3d.section import Section
+from caddie.trace import span
+from caddie.types.convert_to_internal import to_bb
+from caddie.types.serialize import disk_cached, shape_to_bytes, shape_from_bytes
 
 
 def combine_lists(lists):
@@ -29,23 +36,88 @@ def combine_lists(lists):
     return result
 
 
+PAIRING = Literal["nearest", "ordered", "product"]
+
+
+def match_chains(centers: Sequence[Sequence[Point3D]]) -> List[List[int]]:
+    """
+    Match wires between consecutive sections by the distance between their centers.
+    Every wire is connected to the nearest wire of the previous section, and every wire
+    without a successor to the nearest wire of the next section, so a wire that splits
+    or merges continues into several chains.
+
+    Returns one list of wire indices (one per section) for every chain.
+    """
+    if not centers:
+        return [[]]
+    chains = [[i] for i in range(len(centers[0]))]
+    for section in centers[1:]:
+        ends = [centers[len(chain) - 1][chain[-1]] for chain in chains]
+        successors = [set() for _ in chains]
+        for j, center in enumerate(section):
+            nearest = min(range(len(ends)), key=lambda i: ends[i].distance_to_point(center))
+            successors[nearest].add(j)
+        for i, end in enumerate(ends):
+            if not successors[i]:
+                successors[i].add(min(range(len(section)), key=lambda j: section[j].distance_to_point(end)))
+        chains = [chain + [j] for chain, nexts in zip(chains, successors) for j in sorted(nexts)]
+    return chains
+
+
+def build_section(section: Section, precision: float, serialize: bool = False):
+    compound = section.to_shape(precision).compound
+    return shape_to_bytes(compound) if serialize else compound
+
+
+def thru_sections(wires: list, solid: bool, ruled: bool, precision: float, serialize: bool = False):
+    if serialize:
+        wires = [shape_from_bytes(w) for w in wires]
+    with span("BRepOffsetAPI_ThruSections", tolerance=precision, wires=len(wires)) as s:
+        shape = BRepOffsetAPI_ThruSections(solid, ruled, precision)
+        for w in wires:
+            shape.AddWire(topods.Wire(w))
+        built_shape = shape.Shape()
+        s.shapes(wires, built_shape)
+    return shape_to_bytes(built_shape) if serialize else built_shape
+
 
 class LoftBuilder:
-    def __init__(self, ruled: bool = True, solid: bool = True, precision: float = 1e-6):
+    """
+    Sections and the ThruSections lofts between them are independent, and are built
+    with executor when one is given. Shapes are passed as serialized BReps when the
+    executor is a process pool.
+    """
+
+    def __init__(self, ruled: bool = True, solid: bool = True, precision: float = 1e-6,
+                 executor: Optional[Executor] = None, pairing: PAIRING = "nearest"):
+        """
+        pairing decides which wires of a group are lofted together when a section has several:
+        "nearest" follows the nearest wire between consecutive sections (see match_chains),
+        "ordered" lofts the n-th wire of every section together, and
+        "product" lofts every combination of wires (see combine_lists).
+        """
         self.segments: List[Section] = []
         self.ruled = ruled
         self.solid = solid
         self.precision = precision
+        self.pairing = pairing
+        self.executor = executor
+        self.serialize = isinstance(executor, ProcessPoolExecutor)
 
     def add(self, *segment: Section):
         self.segments.extend(segment)
         return self
 
     def to_shape(self) -> Shape3D:
+        key = digest("Loft", self.ruled, self.solid, self.pairing, self.segments, tolerance=self.precision)
+        return Shape3D(disk_cached(key, lambda: self.__build().occ_shape), key)
+
+    def __build(self) -> Shape3D:
         grouped_segments = defaultdict(lambda: ([], []))
 
-        for idx, section in enumerate(self.segments):
-            shape_2d: Shape2D = section.to_shape(self.precision)
+        compounds = self.__map(build_section, self.segments, repeat(self.precision))
+        for idx, (section, compound) in enumerate(zip(self.segments, compounds)):
+            shape_2d: Shape2D = Shape2D(compound)
 
             inner_wires = []
             outer_wires = []
@@ -99,27 +171,53 @@ class LoftBuilder:
             for k, v in grouped_inner_wires.items():
                 grouped_segments[k][1].append(v)
 
-        bool_builder = BooleanBuilder(sort_filter=lambda x: 0 if x[1] == 'fuse' else 1)
+        paths = []
         for k, v in grouped_segments.items():
             outer_w, inner_w = v
             if outer_w:
-                outer_shape = self.__build_bb_shape(outer_w)
-                outer_shape_built = outer_shape.to_shape()
-                bool_builder.add(outer_shape_built)
+                paths.extend((k, "fuse", path) for path in self.__loft_paths(outer_w))
                 if inner_w:
-                    inner_shape = self.__build_bb_shape(v[1]) if v[1] else None
-                    if inner_shape is not None and len(inner_shape.modifiers) > 0:
-                        bool_builder.add(inner_shape.to_shape(), mode="cut")
+                    paths.extend((k, "cut", path) for path in self.__loft_paths(inner_w))
+
+        wire_paths = [path for _, _, path in paths]
+        if self.serialize:
+            wire_paths = [[shape_to_bytes(w) for w in path] for path in wire_paths]
+        lofts = self.__map(
+            thru_sections, wire_paths, repeat(self.solid), repeat(self.ruled), repeat(self.precision)
+        )
+
+        grouped_lofts = defaultdict(lambda: {"fuse": BooleanBuilder(), "cut": BooleanBuilder()})
+        for (k, mode, _), loft in zip(paths, lofts):
+            grouped_lofts[k][mode].add(Shape3D(loft), "fuse")
+
+        bool_builder = BooleanBuilder(sort_filter=lambda x: 0 if x[1] == 'fuse' else 1)
+        for k, builders in grouped_lofts.items():
+            bool_builder.add(builders["fuse"].to_shape())
+            if len(builders["cut"].modifiers) > 0:
+                bool_builder.add(builders["cut"].to_shape(), mode="cut")
         return bool_builder.to_shape()
 
-    def __build_bb_shape(self, wire_segments):
-        wire_segment_paths = combine_lists(wire_segments)
-        bb = BooleanBuilder()
-        for path in wire_segment_paths:
-            shape = BRepOffsetAPI_ThruSections(self.solid, self.ruled, self.precision)
-            for w in path:
-                for w2 in w:
-                    shape.AddWire(w2)
-            built_shape = shape.Shape()
-            bb.add(Shape3D(built_shape), "fuse")
-        return bb
+    def __loft_paths(self, wire_segments) -> List[list]:
+        if self.pairing == "product":
+            return [
+                [w2 for w in path for w2 in w]
+                for path in combine_lists(wire_segments)
+            ]
+        if self.pairing == "ordered":
+            if len({len(wires) for wires in wire_segments}) != 1:
+                raise ValueError("Ordered pairing requires the same number of wires in every section of a group.")
+            return [list(path) for path in zip(*wire_segments)]
+
+        centers = [[to_bb(w).center() for w in wires] for wires in wire_segments]
+        return [
+            [wires[i] for wires, i in zip(wire_segments, chain)]
+            for chain in match_chains(centers)
+        ]
+
+    def __map(self, func, *iterables) -> list:
+        if self.executor is None:
+            return list(map(func, *iterables))
+        if not self.serialize:
+            return list(self.executor.map(func, *iterables))
+        results = self.executor.map(func, *iterables, repeat(True))
+        return [shape_from_bytes(r) for r in results]
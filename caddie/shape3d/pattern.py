@@ -0,0 +1,48 @@
+from typing import List, Sequence
+
+from OCC.Core.TopLoc import TopLoc_Location
+
+from caddie.fingerprint import digest
+from caddie.ladybug_geometry.geometry3d import Point3D, Vector3D
+from caddie.plane import Plane, Translation, Rotation, AXIS_Z, ORIGIN
+from caddie.shape2d.sketch import create_compound_from_shapes
+from caddie.shape3d import Shape3D
+
+
+def linear_pattern(plane: Plane, step: Vector3D, count: int) -> List[Plane]:
+    """count planes, each moved by step (in local coordinates of plane) from the previous one."""
+    return [plane.transformed(Translation(step.x * i, step.y * i, step.z * i)) for i in range(count)]
+
+
+def circular_pattern(plane: Plane, count: int, angle: float = 360, axis: Vector3D = AXIS_Z,
+                     pivot_point: Point3D = ORIGIN) -> List[Plane]:
+    """
+    count planes rotated around axis through pivot_point (in local coordinates of plane),
+    spread evenly over angle degrees. A full circle does not repeat the first plane.
+    """
+    if count < 2:
+        return [plane.copy()] * count
+    step = angle / count if abs(angle) >= 360 else angle / (count - 1)
+    return [plane.transformed(Rotation(step * i, axis, pivot_point)) for i in range(count)]
+
+
+class Pattern:
+    """
+    A feature built once in the XY plane and placed into every plane with a location,
+    like Plane.moved_into, so all instances share the same underlying shape and mesh.
+    """
+
+    def __init__(self, feature: Shape3D, planes: Sequence[Plane]):
+        self.feature = feature
+        self.planes = list(planes)
+
+    def locations(self) -> List[TopLoc_Location]:
+        world = Plane()
+        return [TopLoc_Location(plane.gp_Trsf(world)) for plane in self.planes]
+
+    def to_shape(self) -> Shape3D:
+        compound = create_compound_from_shapes(
+            self.feature.occ_shape.Moved(location) for location in self.locations()
+        )
+        source = None if self.feature.source is None else digest("Pattern", self.feature, self.planes)
+        return Shape3D(compound, source)
@@ -4,6 +4,7 @@ from typing import Union, List, Optional
 
 from caddie.ladybug_geometry.geometry2d import Point2D
 
+from caddie.fingerprint import digest
 from caddie.plane import Plane, ORIGIN, AXIS_Z, AXIS_X
 from caddie.shape2d import Shape2D
 from caddie.shape2d.shapes import Text
@@ -34,6 +35,22 @@ class Section:
         self.sketch = sketch
         self.wire_groups = wire_groups
 
+    def sketch_fingerprint(self, tolerance: float) -> str:
+        """Fingerprint of the sketch, including the text layout for texts."""
+        if isinstance(self.sketch, Text):
+            return TextBuilder.cache_key(self.sketch)
+        return self.sketch.fingerprint(tolerance)
+
+    def fingerprint(self, tolerance: float) -> str:
+        """
+        Fingerprint of the sketch at tolerance and of the exact plane. Quantizing the plane
+        to a length tolerance would merge directions that differ by small angles.
+        """
+        return digest(
+            "Section", self.sketch_fingerprint(tolerance), self.plane.fingerprint(), self.wire_groups,
+            tolerance=tolerance
+        )
+
     def to_shape(self, tolerance: float) -> Shape2D:
         if isinstance(self.sketch, Sketch):
             return SketchBuilder(self.sketch, tolerance).shape2d
@@ -0,0 +1,77 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Tuple
+
+from caddie.fingerprint import digest
+from caddie.plane import Plane
+from caddie.shape2d import Shape2D
+from caddie.shape2d.shapes import Text
+from caddie.shape2d.sketch import create_compound_from_shapes
+from caddie.shape2d.text import TextBuilder
+from caddie.shape3d import Shape3D
+from caddie.shape3d.extrude import ExtrusionBuilder
+from caddie.shape3d.section import Section
+from caddie.trace import span
+from caddie.types.serialize import disk_cached, shape_to_bytes, shape_from_bytes
+
+
+def build_label(text: Text, distance: Optional[float], tolerance: float, serialize: bool = False):
+    """The text face, or its extrusion by distance, in the XY plane."""
+    if distance is None:
+        shape = TextBuilder(text, tolerance).shape2d.compound
+    else:
+        shape = ExtrusionBuilder(Section(Plane(), text), tolerance).to_shape(distance).occ_shape
+    return shape_to_bytes(shape) if serialize else shape
+
+
+class TextBatchBuilder:
+    """
+    Places many texts at once. Every distinct text (by TextBuilder.cache_key) is built, and
+    extruded, once in the XY plane and shared by all items that use it, each moved into its
+    own plane.
+
+    Distinct texts are built with executor when one is given, passing serialized BReps to
+    process pools.
+    """
+
+    def __init__(self, tolerance: float = 0.001, executor: Optional[Executor] = None):
+        self.items: List[Tuple[Text, Plane]] = []
+        self.tolerance = tolerance
+        self.executor = executor
+
+    def add(self, text: Text, plane: Plane):
+        self.items.append((text, plane))
+        return self
+
+    def to_compound(self) -> Shape2D:
+        """All texts as faces in their planes, in a single compound."""
+        return Shape2D(self.__build(None))
+
+    def to_shape(self, distance: float) -> Shape3D:
+        """All texts extruded by distance along their plane normals, in a single compound."""
+        texts = [TextBuilder.cache_key(text) for text, _ in self.items]
+        key = digest("TextBatch", texts, distance, tolerance=self.tolerance)
+        key = digest(key, [plane for _, plane in self.items])
+        return Shape3D(disk_cached(key, lambda: self.__build(distance)), key)
+
+    def __build(self, distance: Optional[float]):
+        # Keyed like the builds themselves, texts that differ below TOL are still built apart.
+        keys = [TextBuilder.cache_key(text) for text, _ in self.items]
+        unique = {}
+        for key, (text, _) in zip(keys, self.items):
+            unique.setdefault(key, text)
+
+        with span("TextBatchBuilder", items=len(self.items), unique=len(unique), distance=distance):
+            texts = list(unique.values())
+            args = texts, repeat(distance), repeat(self.tolerance)
+            if self.executor is None:
+                shapes = list(map(build_label, *args))
+            elif isinstance(self.executor, ProcessPoolExecutor):
+                shapes = [shape_from_bytes(s) for s in self.executor.map(build_label, *args, repeat(True))]
+            else:
+                shapes = list(self.executor.map(build_label, *args))
+            built = dict(zip(unique, shapes))
+
+            return create_compound_from_shapes(
+                plane.moved_into(built[key]) for key, (_, plane) in zip(keys, self.items)
+            )
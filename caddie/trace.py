@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+
+class Span:
+    """
+    A timed operation, recorded by its tracer when the with block exits.
+    """
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.tracer.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+    def set(self, **args: Any):
+        self.args.update(args)
+
+    def shapes(self, inputs: Iterable = (), output=None):
+        """Record face and edge counts of the input and output shapes."""
+        from OCC.Core.TopAbs import TopAbs_FACE, TopAbs_EDGE
+        from caddie.types.convert_to_internal import count_shapes
+
+        inputs = list(inputs)
+        self.args["input_faces"] = sum(count_shapes(s, TopAbs_FACE) for s in inputs)
+        self.args["input_edges"] = sum(count_shapes(s, TopAbs_EDGE) for s in inputs)
+        if output is not None:
+            self.args["output_faces"] = count_shapes(output, TopAbs_FACE)
+            self.args["output_edges"] = count_shapes(output, TopAbs_EDGE)
+
+
+class NullSpan:
+    """
+    Returned while tracing is disabled, every method is a no-op.
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+    def set(self, **args: Any):
+        pass
+
+    def shapes(self, inputs: Iterable = (), output=None):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        self.__lock = threading.Lock()
+        self.__epoch = time.perf_counter()
+
+    def span(self, name: str, **args: Any):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name: str, start: float, duration: float, args: Dict[str, Any]):
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": (start - self.__epoch) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self.__lock:
+            self.events.append(event)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self.__lock:
+            self.events = []
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Events in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        with self.__lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, total, mean and max wall time (in seconds) and cache hits/misses per operation."""
+        grouped = defaultdict(list)
+        with self.__lock:
+            for event in self.events:
+                grouped[event["name"]].append(event)
+
+        result = {}
+        for name, events in sorted(grouped.items()):
+            durations = [e["dur"] / 1e6 for e in events]
+            result[name] = {
+                "count": len(events),
+                "total": sum(durations),
+                "mean": sum(durations) / len(durations),
+                "max": max(durations),
+                "cache_hits": sum(1 for e in events if e["args"].get("cache") == "hit"),
+                "cache_misses": sum(1 for e in events if e["args"].get("cache") == "miss"),
+            }
+        return result
+
+
+tracer = Tracer()
+
+
+def span(name: str, **args: Any):
+    """
+    Time an operation with the global tracer:
+
+        with span("BRepPrimAPI_MakePrism", tolerance=tol) as s:
+            ...
+            s.shapes([input_shape], output_shape)
+    """
+    return tracer.span(name, **args)
+
+
+def enable():
+    tracer.enable()
+
+
+def disable():
+    tracer.disable()
+
+
+def summary() -> Dict[str, Dict[str, Any]]:
+    return tracer.summary()
+
+
+def write_chrome_trace(path: str):
+    tracer.write_chrome_trace(path)
@@ -0,0 +1,56 @@
+from typing import Iterable, Optional, Type, Union, Literal
+
+from OCC.Core.BOPAlgo import BOPAlgo_GlueOff, BOPAlgo_GlueShift, BOPAlgo_GlueFull
+from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Fuse, BRepAlgoAPI_Cut, BRepAlgoAPI_Common
+from OCC.Core.TopTools import TopTools_ListOfShape
+from OCC.Core.TopoDS import TopoDS_Shape
+
+from caddie.trace import span
+
+ALGOS = Union[
+    Type[BRepAlgoAPI_Fuse],
+    Type[BRepAlgoAPI_Cut],
+    Type[BRepAlgoAPI_Common]
+]
+
+GLUE = Literal["off", "shift", "full"]
+
+GLUE_OPTIONS = {
+    "off": BOPAlgo_GlueOff,
+    "shift": BOPAlgo_GlueShift,
+    "full": BOPAlgo_GlueFull,
+}
+
+
+def to_shape_list(shapes: Iterable[TopoDS_Shape]) -> TopTools_ListOfShape:
+    shape_list = TopTools_ListOfShape()
+    for shape in shapes:
+        shape_list.Append(shape)
+    return shape_list
+
+
+def boolean_op(algo_type: ALGOS, arguments: Iterable[TopoDS_Shape], tools: Iterable[TopoDS_Shape],
+               fuzzy_value: Optional[float] = None, parallel: bool = False,
+               glue: GLUE = "off") -> TopoDS_Shape:
+    """
+    Resolve all arguments against all tools in a single boolean operation,
+    instead of folding them one pair at a time.
+
+    parallel runs the intersection stages on all cores. glue speeds up operations on
+    shapes that only touch ("shift": shared faces or edges, "full": no intersecting faces).
+    """
+    arguments, tools = list(arguments), list(tools)
+    with span(algo_type.__name__, tolerance=fuzzy_value, arguments=len(arguments), tools=len(tools)) as s:
+        algo = algo_type()
+        algo.SetArguments(to_shape_list(arguments))
+        algo.SetTools(to_shape_list(tools))
+        if fuzzy_value is not None:
+            algo.SetFuzzyValue(fuzzy_value)
+        algo.SetRunParallel(parallel)
+        algo.SetGlue(GLUE_OPTIONS[glue])
+        algo.Build()
+        if not algo.IsDone():
+            raise ValueError(f"{algo_type.__name__} failed for the given shapes.")
+        result = algo.Shape()
+        s.shapes(arguments + tools, result)
+    return result
@@ -1,4 +1,7 @@
 import time
+from typing import Tuple
+
+import numpy as np
 
 from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
 from OCC.Core.BRepBndLib import brepbndlib
@@ -6,7 +9,7 @@ from OCC.Core.BRepTools import breptools
 
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.GCPnts import GCPnts_UniformDeflection
-from OCC.Core.TopAbs import TopAbs_EDGE, TopAbs_FACE
+from OCC.Core.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX
 from OCC.Core.TopExp import TopExp_Explorer
 from OCC.Core.TopoDS import TopoDS_Shape, topods_Edge
 from OCC.Core.gp import gp_Pnt2d, gp_Pnt
@@ -15,6 +18,7 @@ from caddie.ladybug_geometry.geometry2d import Polygon2D, Point2D, Vector2D
 from math import atan2
 
 from caddie.types import BoundingBox
+from caddie.types.hull import hull_polygon
 
 
 def to_bb(*shapes: TopoDS_Shape) -> BoundingBox:
@@ -24,6 +28,24 @@ def to_bb(*shapes: TopoDS_Shape) -> BoundingBox:
     return BoundingBox.from_bnd_box(bb)
 
 
+def count_shapes(shape: TopoDS_Shape, shape_type) -> int:
+    explorer = TopExp_Explorer(shape, shape_type)
+    count = 0
+    while explorer.More():
+        count += 1
+        explorer.Next()
+    return count
+
+
+def estimate_size(shape: TopoDS_Shape) -> int:
+    """Rough in-memory footprint of a shape in bytes, from its face, edge and vertex counts."""
+    return (
+        2048 * count_shapes(shape, TopAbs_FACE) +
+        512 * count_shapes(shape, TopAbs_EDGE) +
+        128 * count_shapes(shape, TopAbs_VERTEX)
+    )
+
+
 def to_Point2D(*pnt: gp_Pnt):
     return [Point2D(p.X(), p.Y()) for p in pnt]
 
@@ -63,24 +85,34 @@ def quickhull(points):
 
     return [leftmost] + upper_hull + [rightmost] + lower_hull
 
-def shape_to_convex(wire, deflection=0.01):
-    """Extract the points from the wire's edges and project them to 2D."""
-    explorer = TopExp_Explorer(wire, TopAbs_FACE)
-    points = []
-
+def sample_edges(shape: TopoDS_Shape, deflection=0.01) -> np.ndarray:
+    """
+    Discretize the edges of the outer wires of the shape's faces, projected to the XY plane,
+    into an (n, 2) array.
+    """
+    samples = []
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
     while explorer.More():
         wire = breptools.OuterWire(explorer.Value())
-        #wire = breptools_OuterWire(explorer.Value())
         edge_explorer = TopExp_Explorer(wire, TopAbs_EDGE)
         while edge_explorer.More():
-            curve_adaptor = BRepAdaptor_Curve(edge_explorer.Value())
-
-            # Discretize curved edges
-            discretizer = GCPnts_UniformDeflection(curve_adaptor, deflection)
-            for i in range(1, discretizer.NbPoints() + 1):
-                p = discretizer.Value(i)
-                points.append(Point2D(p.X(), p.Y()))  # Projecting onto XY plane
+            discretizer = GCPnts_UniformDeflection(BRepAdaptor_Curve(edge_explorer.Value()), deflection)
+            count = discretizer.NbPoints()
+            coords = np.empty((count, 2))
+            for i in range(count):
+                p = discretizer.Value(i + 1)
+                coords[i] = p.X(), p.Y()  # Projecting onto XY plane
+            samples.append(coords)
             edge_explorer.Next()
-
         explorer.Next()
-    return Polygon2D(quickhull(points))
+    return np.concatenate(samples) if samples else np.empty((0, 2))
+
+
+def shape_to_hull(shape: TopoDS_Shape, deflection=0.01) -> Tuple[Polygon2D, np.ndarray]:
+    """Convex hull of the shape's outer wires in the XY plane, as a Polygon2D and its vertex array."""
+    return hull_polygon(sample_edges(shape, deflection))
+
+
+def shape_to_convex(shape: TopoDS_Shape, deflection=0.01) -> Polygon2D:
+    """Extract the points from the wire's edges, project them to 2D and return their convex hull."""
+    return shape_to_hull(shape, deflection)[0]
@@ -0,0 +1,89 @@
+from typing import Tuple
+
+import numpy as np
+
+from caddie.ladybug_geometry.geometry2d import Polygon2D, Point2D
+
+# Vectorized passes before the stack pass of the monotone chain, bounded so the
+# total cost stays linear after sorting.
+THINNING_PASSES = 4
+
+
+def _cross(o: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+
+def octagon_filter(points: np.ndarray) -> np.ndarray:
+    """
+    Akl–Toussaint heuristic: drop the points strictly inside the octagon spanned by
+    the extreme points in x, y, x + y and x - y. None of them can be on the hull.
+    """
+    x, y = points[:, 0], points[:, 1]
+    indices = [
+        np.argmin(y), np.argmax(x - y), np.argmax(x), np.argmax(x + y),
+        np.argmax(y), np.argmin(x - y), np.argmin(x), np.argmin(x + y),
+    ]
+    octagon = points[indices]
+    keep = np.ones(len(octagon), dtype=bool)
+    keep[1:] = np.any(octagon[1:] != octagon[:-1], axis=1)
+    keep[0] = np.any(octagon[0] != octagon[-1])
+    octagon = octagon[keep]
+    if len(octagon) < 3:
+        return points
+
+    inside = np.ones(len(points), dtype=bool)
+    for a, b in zip(octagon, np.roll(octagon, -1, axis=0)):
+        inside &= _cross(a, b, points) > 0
+    return points[~inside]
+
+
+def _chain(points: np.ndarray) -> np.ndarray:
+    # Andrew's monotone chain: one stack pass over the sorted points, popping the top
+    # while it does not make a strict left turn with the next point. A few whole-array
+    # passes first drop the points that do not turn left with their neighbours, which
+    # cannot be chain vertices either, so the Python loop sees far fewer points.
+    for _ in range(THINNING_PASSES):
+        if len(points) < 3:
+            break
+        turns = _cross(points[:-2], points[1:-1], points[2:]) > 0
+        if turns.all():
+            break
+        points = points[np.concatenate(([True], turns, [True]))]
+
+    xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+    chain = []
+    for i in range(len(xs)):
+        x, y = xs[i], ys[i]
+        while len(chain) >= 2:
+            o, a = chain[-2], chain[-1]
+            if (xs[a] - xs[o]) * (y - ys[o]) - (ys[a] - ys[o]) * (x - xs[o]) > 0:
+                break
+            chain.pop()
+        chain.append(i)
+    return points[chain]
+
+
+def convex_hull(points: np.ndarray) -> np.ndarray:
+    """
+    Convex hull of an (n, 2) array with Andrew's monotone chain algorithm, returned as
+    an (m, 2) array of vertices in counter-clockwise order, without collinear points.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) < 2:
+        return points
+    if len(points) > 8:
+        points = octagon_filter(points)
+    points = points[np.lexsort((points[:, 1], points[:, 0]))]
+    points = points[np.concatenate(([True], np.any(points[1:] != points[:-1], axis=1)))]
+    if len(points) < 3:
+        return points
+
+    lower = _chain(points)
+    upper = _chain(points[::-1])
+    return np.concatenate((lower[:-1], upper[:-1]))
+
+
+def hull_polygon(points: np.ndarray) -> Tuple[Polygon2D, np.ndarray]:
+    """The convex hull of points as a Polygon2D, together with its vertex array."""
+    hull = convex_hull(points)
+    return Polygon2D(tuple(Point2D(x, y) for x, y in hull.tolist())), hull
@@ -0,0 +1,55 @@
+import os
+import pickle
+from typing import Optional
+
+from OCC.Core.BinTools import bintools
+from OCC.Core.TopoDS import TopoDS_Shape
+
+from caddie.cache import DiskCache, DEFAULT_MAX_DISK_BYTES, set_disk_cache, disk_cached  # noqa: F401
+
+
+def write_shape(shape: TopoDS_Shape, path: str):
+    """Write shape to path as a binary BRep."""
+    if not bintools.Write(shape, path):
+        raise IOError(f"Failed to write shape to {path}")
+
+
+def read_shape(path: str) -> TopoDS_Shape:
+    """Read a binary BRep written by write_shape."""
+    shape = TopoDS_Shape()
+    if not os.path.exists(path) or not bintools.Read(shape, path):
+        raise IOError(f"Failed to read shape from {path}")
+    return shape
+
+
+def shape_to_bytes(shape: TopoDS_Shape) -> bytes:
+    """
+    Serialize shape, location and orientation included, e.g. to pass it to another process.
+    Relies on the BRep based pickling support of pythonocc's TopoDS_Shape.
+    """
+    return pickle.dumps(shape, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def shape_from_bytes(data: bytes) -> TopoDS_Shape:
+    return pickle.loads(data)
+
+
+def enable_disk_cache(directory: str, max_bytes: Optional[int] = DEFAULT_MAX_DISK_BYTES) -> DiskCache:
+    """
+    Persist built shapes as binary BReps under directory. The directory can be shared
+    by several processes on the same host.
+    """
+    cache = DiskCache(directory, write_shape, read_shape, max_bytes)
+    set_disk_cache(cache)
+    return cache
+
+
+def disable_disk_cache():
+    set_disk_cache(None)
+
+
+if os.environ.get("CADDIE_DISK_CACHE"):
+    enable_disk_cache(
+        os.environ["CADDIE_DISK_CACHE"],
+        int(os.environ.get("CADDIE_DISK_CACHE_MAX_BYTES", DEFAULT_MAX_DISK_BYTES))
+    )
@@ -1,17 +1,49 @@
+import json
 import pathlib
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
-from caddie.ladybug_geometry.geometry2d import Arc2D, Point2D
+from caddie import trace
+from caddie.fingerprint import digest
+from caddie.ladybug_geometry.geometry2d import Arc2D, Point2D, Polygon2D, Vector2D
 from caddie.plane import Plane, Translation, Rotation, AXIS_X
 from caddie.shape2d.shapes import Face, Sketch, MODE, Text
+from caddie.shape2d.sketch import SketchBuilder, create_compound_from_shapes, resolve_polygons
+from caddie.shape2d.text import TextBuilder, font_registry, preload_font
 from caddie.shape3d import Shape3D
 from caddie.shape3d.boolean import BooleanBuilder
 from caddie.shape3d.extrude import ExtrusionBuilder
+from OCC.Core.Font import Font_FA_Bold, Font_FA_Regular
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakePolygon
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.TopoDS import TopoDS_Iterator
+from OCC.Core.gp import gp_Pnt
 from OCC.Extend.DataExchange import write_stl_file
 
-from caddie.shape3d.loft import LoftBuilder
+from caddie.ladybug_geometry.geometry3d import Point3D, Vector3D
+from caddie.shape3d.text_batch import TextBatchBuilder
+from caddie.shape3d.pattern import Pattern, linear_pattern, circular_pattern
+from caddie.gltf import read_glb
+from caddie.render import (LOD_LEVELS, Tessellator, tessellator, triangulation_to_mesh, shape_to_glb, shape_to_lod_glb,
+                           write_gltf_file, write_stl_file as write_mesh_stl_file)
+from caddie.shape3d.loft import LoftBuilder, match_chains
 from caddie.shape3d.section import Section, WireGroups
-from tests.shapes import triangle_w_arc_add, circle_add
+from caddie.types.convert_to_internal import to_bb
+from tests.shapes import triangle_w_arc_add, circle_add, circle_sub
+
+
+class Square:
+    def __init__(self, size: float):
+        self.size = size
+
+
+@SketchBuilder.register_primitive(Square)
+def square_generator(builder: SketchBuilder, square: Square):
+    polygon = BRepBuilderAPI_MakePolygon()
+    for x, y in ((0, 0), (square.size, 0), (square.size, square.size), (0, square.size)):
+        polygon.Add(gp_Pnt(x, y, 0))
+    polygon.Close()
+    return polygon.Wire()
 
 
 class TestBasic(unittest.TestCase):
@@ -37,6 +69,68 @@ class TestBasic(unittest.TestCase):
         write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
         self.assertFileMinSize(path, 1000)  # set threshold you consider “real”
 
+    def test_extrude_batch_sketch(self):
+        holes = [
+            Face(MODE.SUB, Arc2D(Point2D(x, y), 1))
+            for x in range(-8, 9, 4) for y in range(-8, 9, 4)
+        ]
+        section = Section(Plane(), Sketch(
+            Face(MODE.ADD, Arc2D(Point2D(-4, 0), 12)),
+            Face(MODE.ADD, Arc2D(Point2D(4, 0), 12)),
+            *holes
+        ))
+        sketch_builder = SketchBuilder(section.sketch, batch=True)
+        self.assertIsNotNone(sketch_builder.shape2d.compound)
+        out: Shape3D = ExtrusionBuilder(section).to_shape(1)
+        path = f"{self.OUTPUT_PATH}/extrude_batch_sketch.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_extrude_polygons(self):
+        def square(x, y, size):
+            return Polygon2D.from_rectangle(Point2D(x, y), Vector2D(0, 1), size, size)
+
+        faces = (
+            Face(MODE.ADD, square(0, 0, 10)),
+            Face(MODE.ADD, square(5, 5, 10)),
+            Face(MODE.ADD, square(30, 0, 5)),
+            Face(MODE.SUB, square(1, 1, 2)),
+            Face(MODE.SUB, square(31, 1, 1)),
+        )
+        resolved = resolve_polygons(faces, [f.shape[0] for f in faces], 1e-5)
+        self.assertEqual(
+            sorted((round(b.area, 6), len(h)) for b, h in resolved),
+            [(25.0, 1), (175.0, 1)]
+        )
+
+        self.assertFalse(SketchBuilder.polygon_fast_path)
+        SketchBuilder.polygon_fast_path = True
+        try:
+            out: Shape3D = ExtrusionBuilder(Section(Plane(), Sketch(*faces))).to_shape(1)
+        finally:
+            SketchBuilder.polygon_fast_path = False
+
+        # Edges closer than the tolerance are snapped together instead of leaving slivers.
+        near = (
+            Face(MODE.ADD, square(0, 0, 10)),
+            Face(MODE.ADD, square(10 + 2e-6, 0, 10)),
+            Face(MODE.SUB, square(5, 2e-6, 10)),
+        )
+        resolved = resolve_polygons(near, [f.shape[0] for f in near], 1e-5)
+        self.assertEqual([(len(b.vertices), len(h)) for b, h in resolved], [(4, 0), (4, 0)])
+
+        path = f"{self.OUTPUT_PATH}/extrude_polygons.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_extrude_registered_primitive(self):
+        out: Shape3D = ExtrusionBuilder(
+            Section(Plane(), Sketch(Face(MODE.ADD, Square(4)), circle_sub))
+        ).to_shape(1)
+        path = f"{self.OUTPUT_PATH}/extrude_registered_primitive.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
     def test_extrude_text(self):
         out: Shape3D = ExtrusionBuilder(
             Section(Plane(), Text("ABC"))
@@ -45,6 +139,179 @@ class TestBasic(unittest.TestCase):
         write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
         self.assertFileMinSize(path, 1000)  # set threshold you consider “real”
 
+    def test_text_glyphs(self):
+        composed = TextBuilder(Text("SN-0001", 10, h_align="LEFT"), compose_glyphs=True)
+        self.assertGreater(composed.bb.size.x, 10)
+        self.assertIn(("Arial", int(Font_FA_Bold), 10, "0"), TextBuilder.glyph_cache.glyphs)
+
+        text = Text("SN-0001", 10, h_align="LEFT")
+        rendered = TextBuilder(text)
+        self.assertIsNot(rendered.shape2d, composed.shape2d)
+        self.assertNotEqual(TextBuilder.cache_key(text, True), TextBuilder.cache_key(text, False))
+
+        TextBuilder.compose_glyphs = True
+        try:
+            out: Shape3D = ExtrusionBuilder(Section(Plane(), text)).to_shape(1)
+        finally:
+            TextBuilder.compose_glyphs = False
+        self.assertNotEqual(out.source, ExtrusionBuilder(Section(Plane(), text)).to_shape(1).source)
+        path = f"{self.OUTPUT_PATH}/extrude_text_glyphs.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_font_registry(self):
+        preload_font("Arial", "REGULAR", 8)
+        font = font_registry.font("Arial", Font_FA_Regular, 8)
+        self.assertIs(font_registry.font("Arial", Font_FA_Regular, 8), font)
+
+        regular = TextBuilder(Text("W", 8, aspect="REGULAR"), compose_glyphs=True)
+        bold = TextBuilder(Text("W", 8), compose_glyphs=True)
+        self.assertIsNot(regular.shape2d, bold.shape2d)
+        self.assertIn(("Arial", int(Font_FA_Regular), 8, "W"), TextBuilder.glyph_cache.glyphs)
+        self.assertFalse(font_registry.render("W", "Arial", Font_FA_Regular, 8).IsNull())
+        self.assertGreater(font_registry.advance("Arial", Font_FA_Regular, 8, "W", "A"), 0)
+        self.assertGreater(font_registry.line_spacing("Arial", Font_FA_Regular, 8), 0)
+
+        # Registering a file under a family name drops the glyphs rendered with the old font.
+        self.assertIn(TextBuilder.glyph_cache.forget, font_registry.listeners)
+        TextBuilder.glyph_cache.forget("Arial")
+        self.assertNotIn(("Arial", int(Font_FA_Regular), 8, "W"), TextBuilder.glyph_cache.glyphs)
+        # Built text is keyed on the file the family resolves to, not only on its name.
+        text = Text("W", 8)
+        self.assertEqual(
+            TextBuilder.cache_key(text, False),
+            digest(text, font_registry.font_path("Arial", Font_FA_Bold), "brep")
+        )
+
+    def test_text_hull_lazy(self):
+        text = Text("HULL", 10)
+        builder = TextBuilder(text)
+        self.assertEqual(builder.entry.hulls, {})
+        coarse = TextBuilder.get_hull(text, deflection=0.1)
+        self.assertEqual(set(builder.entry.hulls), {0.1})
+        self.assertGreaterEqual(len(builder.hull.vertices), 3)
+        self.assertEqual(set(builder.entry.hulls), {0.1, TextBuilder.hull_deflection})
+        self.assertAlmostEqual(coarse.area, builder.hull.area, delta=0.05 * builder.hull.area)
+
+    def test_extrude_memo(self):
+        sketch = Sketch(circle_add)
+        first = ExtrusionBuilder(Section(Plane(), sketch)).to_shape(4)
+        moved = ExtrusionBuilder(
+            Section(Plane().transformed(Translation(0, 0, 10), Rotation(45, AXIS_X)), sketch)
+        ).to_shape(4)
+        self.assertTrue(first.occ_shape.IsPartner(moved.occ_shape))
+
+        tilted = ExtrusionBuilder(Section(Plane().transformed(Rotation(0.01, AXIS_X)), sketch)).to_shape(4)
+        self.assertNotEqual(first.source, tilted.source)
+        self.assertNotEqual(first.source, moved.source)
+
+    def test_pattern(self):
+        feature = ExtrusionBuilder(Section(Plane(), Sketch(circle_add))).to_shape(3)
+        planes = linear_pattern(Plane(), Vector3D(40, 0, 0), 3) + circular_pattern(
+            Plane().transformed(Translation(0, 100, 0)), 6, pivot_point=Point3D(0, -20, 0)
+        )
+        self.assertEqual(len(planes), 9)
+        pattern = Pattern(feature, planes)
+        out = pattern.to_shape()
+        self.assertGreater(to_bb(out.occ_shape).size.x, 80)
+
+        path = f"{self.OUTPUT_PATH}/pattern.gltf"
+        write_gltf_file(feature.occ_shape, path, locations=pattern.locations())
+        with open(path) as f:
+            gltf = json.load(f)
+        self.assertEqual(len(gltf["meshes"]), 1)
+        self.assertGreaterEqual(len(gltf["nodes"]), 9)
+
+    def test_shape_to_glb(self):
+        feature = ExtrusionBuilder(Section(Plane(), Sketch(circle_add))).to_shape(3)
+        gltf, binary = read_glb(shape_to_glb(feature.occ_shape))
+        self.assertEqual(len(gltf["meshes"]), 1)
+        self.assertGreater(len(binary), 1000)
+
+        planes = linear_pattern(Plane(), Vector3D(40, 0, 0), 4)
+        path = pathlib.Path(f"{self.OUTPUT_PATH}/pattern.glb")
+        with path.open("wb") as f:
+            shape_to_glb(feature.occ_shape, f, locations=Pattern(feature, planes).locations())
+        gltf, instanced = read_glb(path.read_bytes())
+        self.assertEqual(len(gltf["nodes"]), 5)
+        self.assertEqual(len(instanced), len(binary))
+
+        gltf, quantized = read_glb(shape_to_glb(feature.occ_shape, quantize=True))
+        self.assertIn("KHR_mesh_quantization", gltf["extensionsRequired"])
+        self.assertLess(len(quantized), len(binary) * 0.6)
+
+    def test_tessellator(self):
+        shape = ExtrusionBuilder(Section(Plane(), Sketch(triangle_w_arc_add))).to_shape(7).occ_shape
+        tessellator = Tessellator()
+        self.assertTrue(tessellator.mesh(shape, 0.1, 0.5))
+        self.assertFalse(tessellator.mesh(shape, 0.1, 0.5))
+        self.assertFalse(tessellator.mesh(Plane().transformed(Translation(5, 0, 0)).moved_into(shape), 0.1, 0.5))
+        self.assertEqual(tessellator.level(shape), (0.1, 0.5))
+        self.assertTrue(tessellator.mesh(shape, 0.01, 0.2))
+        self.assertEqual(tessellator.level(shape), (0.01, 0.2))
+
+        # Meshing another shape with the same faces invalidates the record.
+        other = ExtrusionBuilder(Section(Plane(), Sketch(circle_sub))).to_shape(2).occ_shape
+        compound = create_compound_from_shapes([shape, other])
+        self.assertTrue(tessellator.mesh(compound, 0.1, 0.5))
+        self.assertIsNone(tessellator.level(shape))
+        self.assertEqual(tessellator.level(compound), (0.1, 0.5))
+
+        # A finer triangulation from elsewhere is not kept for a coarser level.
+        fresh = ExtrusionBuilder(Section(Plane(), Sketch(circle_add))).to_shape(9).occ_shape
+        BRepMesh_IncrementalMesh(fresh, 0.001, True, 0.1, False).Perform()
+        fine = triangulation_to_mesh(fresh).triangle_count
+        self.assertTrue(tessellator.mesh(fresh, 0.2, 0.5))
+        self.assertLess(triangulation_to_mesh(fresh).triangle_count, fine)
+
+        path = f"{self.OUTPUT_PATH}/tessellated.stl"
+        write_mesh_stl_file(shape, path, 0.01, 0.2)
+        self.assertFileMinSize(path, 1000)
+
+    def test_shape_to_lod_glb(self):
+        shape = ExtrusionBuilder(Section(Plane(), Sketch(circle_add))).to_shape(6).occ_shape
+        trace.tracer.clear()
+        trace.enable()
+        try:
+            data, triangles = shape_to_lod_glb(shape)
+            meshed = [e["args"] for e in trace.tracer.events if e["name"] == "BRepMesh_IncrementalMesh"]
+        finally:
+            trace.disable()
+            trace.tracer.clear()
+        # Only the coarsest level is meshed from scratch, the finer ones refine it.
+        self.assertEqual([args.get("refine") for args in meshed], [False] + [True] * (len(LOD_LEVELS) - 1))
+        self.assertEqual(len(triangles), len(LOD_LEVELS))
+        self.assertEqual(triangles, sorted(triangles, reverse=True))
+        gltf, _ = read_glb(data)
+        self.assertEqual(len(gltf["meshes"]), len(LOD_LEVELS))
+        self.assertIn("MSFT_lod", gltf["extensionsUsed"])
+        self.assertEqual(tessellator.level(shape), LOD_LEVELS[0])
+
+    def test_text_batch(self):
+        builder = TextBatchBuilder()
+        for i in range(20):
+            plane = Plane().transformed(Translation(30 * (i % 5), 15 * (i // 5), 0))
+            builder.add(Text(f"L{i % 4}", 10), plane)
+
+        faces = builder.to_compound()
+        children = TopoDS_Iterator(faces.compound)
+        count = 0
+        while children.More():
+            count += 1
+            children.Next()
+        self.assertEqual(count, 20)
+
+        # Texts that differ below the tolerance are still built, and cached, apart.
+        close = Text("L0", 10 + 1e-7)
+        TextBatchBuilder().add(Text("L0", 10), Plane()).add(close, Plane()).to_compound()
+        self.assertIn(TextBuilder.cache_key(close), TextBuilder.cache)
+
+        out: Shape3D = builder.to_shape(2)
+        self.assertGreater(to_bb(out.occ_shape).size.x, 120)
+        path = f"{self.OUTPUT_PATH}/text_batch.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
     def test_bool_3d(self):
         p0 = Plane()
         out_add: Shape3D = ExtrusionBuilder(
@@ -63,6 +330,63 @@ class TestBasic(unittest.TestCase):
         write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
         self.assertFileMinSize(path, 1000)  # set threshold you consider “real”
 
+    def test_bool_3d_multi_tool(self):
+        plate: Shape3D = ExtrusionBuilder(
+            Section(Plane(), Sketch(circle_add))
+        ).to_shape(2)
+        bool_builder = BooleanBuilder(parallel=True).add(plate)
+        for x in range(-6, 7, 3):
+            hole = ExtrusionBuilder(
+                Section(Plane().transformed(Translation(x, 0, -1)), Sketch(Face(MODE.ADD, Arc2D(Point2D(), 1))))
+            ).to_shape(4)
+            bool_builder.add(hole, "cut")
+
+        out = bool_builder.to_shape()
+        path = f"{self.OUTPUT_PATH}/bool_3d_multi_tool.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_bool_3d_tree(self):
+        bool_builder = BooleanBuilder(reduction="tree")
+        for x in range(5):
+            bool_builder.add(ExtrusionBuilder(
+                Section(Plane().transformed(Translation(x * 1.5, 0, 0)), Sketch(Face(MODE.ADD, Arc2D(Point2D(), 1))))
+            ).to_shape(1))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            bool_builder.executor = executor
+            out = bool_builder.to_shape()
+        path = f"{self.OUTPUT_PATH}/bool_3d_tree.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_bool_3d_incremental(self):
+        plate: Shape3D = ExtrusionBuilder(Section(Plane(), Sketch(circle_add))).to_shape(2)
+
+        def hole(x):
+            return ExtrusionBuilder(
+                Section(Plane().transformed(Translation(x, 0, -1)), Sketch(Face(MODE.ADD, Arc2D(Point2D(), 1))))
+            ).to_shape(4)
+
+        first = BooleanBuilder(incremental=True).add(plate).add(hole(-6), "cut").add(hole(0), "cut").add(hole(6), "cut")
+        first.to_shape()
+        self.assertEqual(first.first_recomputed, 1)
+
+        changed = BooleanBuilder(incremental=True).add(plate).add(hole(-6), "cut").add(hole(0), "cut").add(hole(3), "cut")
+        out = changed.to_shape()
+        self.assertEqual(changed.first_recomputed, 3)
+
+        # Shapes without a source are never memoized, their fingerprint is an object identity.
+        for _ in range(2):
+            anonymous = BooleanBuilder(incremental=True).add(plate).add(hole(-6), "cut").add(
+                Shape3D(hole(0).occ_shape), "cut").add(hole(6), "cut")
+            self.assertIsNone(anonymous.to_shape().source)
+            self.assertEqual(anonymous.first_recomputed, 1)
+
+        path = f"{self.OUTPUT_PATH}/bool_3d_incremental.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
     def test_loft_simple(self):
         p0 = Plane()
         p1 = p0.transformed(Translation(0, 0, 10), Rotation(15, AXIS_X))
@@ -94,6 +418,25 @@ class TestBasic(unittest.TestCase):
         path = f"{self.OUTPUT_PATH}/loft_simple.stl"
         write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
 
+    def test_loft_executor(self):
+        p0 = Plane()
+        sections = [
+            Section(p0.transformed(Translation(0, 0, 10 * i), Rotation(5 * i, AXIS_X)), Sketch(circle_add, circle_sub))
+            for i in range(4)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            out = LoftBuilder(False, executor=executor).add(*sections).to_shape()
+        path = f"{self.OUTPUT_PATH}/loft_executor.stl"
+        write_stl_file(out.occ_shape, path, mode="binary", linear_deflection=0.1, angular_deflection=0.1)
+        self.assertFileMinSize(path, 1000)
+
+    def test_match_chains(self):
+        stations = [[Point3D(x, 0, z) for x in (-10, 0, 10)] for z in range(6)]
+        self.assertEqual(match_chains(stations), [[i] * 6 for i in range(3)])
+
+        split = [[Point3D(0, 0, 0)], [Point3D(-5, 0, 1), Point3D(5, 0, 1)], [Point3D(0, 0, 2)]]
+        self.assertEqual(match_chains(split), [[0, 0, 0], [0, 1, 0]])
+
     def test_loft_complex(self):
         l_0 = ["a", "b", "c"]  # 3 faces
         l_1 = ["a", "bc"]  # 2 faces
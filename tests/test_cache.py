@@ -0,0 +1,49 @@
+import unittest
+
+from caddie.cache import ShapeCache
+
+
+class TestShapeCache(unittest.TestCase):
+
+    def test_lru_eviction_by_cost(self):
+        cache = ShapeCache(max_cost=10, cost=len)
+        cache["a"] = "aaaa"
+        cache["b"] = "bbbb"
+        assert cache.get("a") == "aaaa"  # "a" is now most recently used
+        cache["c"] = "cccc"
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.total_cost == 8
+        assert cache.evictions == 1
+
+    def test_counters(self):
+        cache = ShapeCache(max_cost=None)
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        with self.assertRaises(KeyError):
+            _ = cache["b"]
+
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 2
+        assert stats.entries == 1
+
+    def test_discard(self):
+        cache = ShapeCache(max_cost=None, cost=len)
+        cache[("Arial", "a")] = "aa"
+        cache[("Arial", "b")] = "bbb"
+        cache[("Sans", "a")] = "a"
+        assert cache.discard(lambda key: key[0] == "Arial") == 2
+        assert len(cache) == 1
+        assert cache.total_cost == 1
+
+    def test_shrinking_cap_evicts(self):
+        cache = ShapeCache(max_cost=None)
+        for i in range(5):
+            cache.put(i, i)
+        cache.max_cost = 2
+        assert len(cache) == 2
+        assert 3 in cache and 4 in cache
@@ -0,0 +1,41 @@
+import pathlib
+import tempfile
+import unittest
+
+from caddie.cache import DiskCache
+
+
+def write_text(value, path):
+    pathlib.Path(path).write_text(value)
+
+
+def read_text(path):
+    return pathlib.Path(path).read_text()
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def test_round_trip_and_size_cap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, write_text, read_text, max_bytes=25)
+            assert cache.get("aa01") is None
+
+            cache.put("aa01", "x" * 10)
+            cache.put("bb02", "y" * 10)
+            assert cache.get("aa01") == "x" * 10
+
+            cache.put("cc03", "z" * 10)
+            assert cache.evictions == 1
+            assert cache.get("cc03") == "z" * 10
+            assert not list(pathlib.Path(directory).rglob(DiskCache.TMP_PREFIX + "*"))
+
+    def test_trim_to_low_water(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, write_text, read_text, max_bytes=100, low_water=0.9)
+            for i in range(11):
+                cache.put(f"aa{i:02}", "x" * 10)
+            # 110 bytes: trimmed down to 90 bytes instead of 100.
+            assert cache.evictions == 2
+            cache.put("bb00", "y" * 10)
+            assert cache.evictions == 2
+            assert cache.get("aa00") is None and cache.get("aa10") == "x" * 10
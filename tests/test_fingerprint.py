@@ -0,0 +1,52 @@
+import unittest
+
+from caddie.fingerprint import digest
+from caddie.ladybug_geometry.geometry2d import Arc2D, Point2D
+from caddie.plane import Plane, Translation, Rotation, AXIS_X
+from caddie.shape2d.shapes import Face, Sketch, MODE, Text
+from caddie.shape3d.section import Section
+from tests.shapes import circle_add, triangle_w_arc_add
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_mode_is_part_of_key(self):
+        add = Face(MODE.ADD, Arc2D(Point2D(), 3))
+        sub = Face(MODE.SUB, Arc2D(Point2D(), 3))
+        assert add.fingerprint() != sub.fingerprint()
+        assert hash(add) != hash(sub)
+
+    def test_quantized_to_tolerance(self):
+        a = Sketch(Face(MODE.ADD, Arc2D(Point2D(0, 0), 3)))
+        b = Sketch(Face(MODE.ADD, Arc2D(Point2D(1e-9, 0), 3)))
+        c = Sketch(Face(MODE.ADD, Arc2D(Point2D(1e-3, 0), 3)))
+        assert a.fingerprint(1e-5) == b.fingerprint(1e-5)
+        assert a.fingerprint(1e-5) != c.fingerprint(1e-5)
+        assert a.fingerprint(1e-2) == c.fingerprint(1e-2)
+
+    def test_ints_quantized_like_floats(self):
+        assert Sketch(Face(MODE.ADD, Arc2D(Point2D(), 1))).fingerprint(1e-5) != \
+               Sketch(Face(MODE.ADD, Arc2D(Point2D(), 1e-5))).fingerprint(1e-5)
+        assert Sketch(Face(MODE.ADD, Arc2D(Point2D(3, 0), 1))).fingerprint(1e-5) != \
+               Sketch(Face(MODE.ADD, Arc2D(Point2D(3e-5, 0), 1))).fingerprint(1e-5)
+        # Like the extrusion cache key for to_shape(4) and to_shape(0.004).
+        assert digest("Extrusion", 4, tolerance=0.001) != digest("Extrusion", 0.004, tolerance=0.001)
+        assert digest(4, tolerance=0.001) == digest(4.0, tolerance=0.001)
+        assert digest(4) == digest(4.0)
+        assert digest(True) != digest(1)
+
+    def test_structure(self):
+        assert Sketch(circle_add, triangle_w_arc_add).fingerprint() != \
+               Sketch(triangle_w_arc_add, circle_add).fingerprint()
+        assert Text("ABC").fingerprint() == Text("ABC").fingerprint()
+        assert Text("ABC").fingerprint() != Text("ABC", h_align="LEFT").fingerprint()
+        assert Text("ABC").fingerprint() != Text("ABC", font="DejaVu Sans").fingerprint()
+        assert Text("ABC").fingerprint() != Text("ABC", aspect="REGULAR").fingerprint()
+        assert Plane().fingerprint() != Plane().transformed(Translation(0, 0, 1)).fingerprint()
+
+    def test_section_plane_exact(self):
+        sketch = Sketch(circle_add)
+        tilted = Plane().transformed(Rotation(0.01, AXIS_X))
+        assert Plane().fingerprint(1e-3) == tilted.fingerprint(1e-3)
+        assert Section(Plane(), sketch).fingerprint(1e-3) != Section(tilted, sketch).fingerprint(1e-3)
+        assert Section(Plane(), sketch).fingerprint(1e-3) == Section(Plane(), sketch).fingerprint(1e-3)
@@ -0,0 +1,149 @@
+import io
+import unittest
+
+import numpy as np
+
+from caddie.gltf import GlbWriter, Mesh, merge_meshes, read_glb, optimize_indices, Z_UP_TO_Y_UP, ARRAY_BUFFER
+
+
+def tetrahedron() -> Mesh:
+    positions = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+    indices = np.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]], dtype=np.uint32)
+    normals = positions - positions.mean(axis=0)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    return Mesh(positions, indices, normals, "tetrahedron")
+
+
+class TestGlb(unittest.TestCase):
+
+    def test_round_trip(self):
+        writer = GlbWriter()
+        mesh = writer.add_mesh(tetrahedron())
+        children = [writer.add_node(mesh, [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, x, 0, 0, 1]) for x in range(3)]
+        writer.add_node(matrix=Z_UP_TO_Y_UP, children=children, root=True)
+
+        buffer = io.BytesIO()
+        length = writer.write(buffer)
+        data = buffer.getvalue()
+        self.assertEqual(length, len(data))
+        self.assertEqual(length % 4, 0)
+
+        gltf, binary = read_glb(data)
+        self.assertEqual(len(gltf["meshes"]), 1)
+        self.assertEqual(len(gltf["nodes"]), 4)
+        self.assertEqual(gltf["scenes"][0]["nodes"], [3])
+        self.assertEqual(gltf["buffers"][0]["byteLength"], len(binary))
+
+        primitive = gltf["meshes"][0]["primitives"][0]
+        position = gltf["accessors"][primitive["attributes"]["POSITION"]]
+        self.assertEqual(position["count"], 4)
+        self.assertEqual(position["max"], [1, 1, 1])
+        view = gltf["bufferViews"][position["bufferView"]]
+        positions = np.frombuffer(binary, np.float32, 12, view["byteOffset"]).reshape(4, 3)
+        np.testing.assert_array_equal(positions, tetrahedron().positions)
+
+        indices = gltf["accessors"][primitive["indices"]]
+        self.assertEqual(indices["count"], 12)
+        self.assertEqual(indices["componentType"], 5123)
+
+    def test_lod(self):
+        writer = GlbWriter()
+        meshes = [writer.add_mesh(tetrahedron()) for _ in range(3)]
+        primary = writer.add_lod_node(meshes, screen_coverage=[0.5, 0.2, 0.01])
+        writer.add_node(children=[primary], root=True)
+
+        gltf, _ = read_glb(_to_bytes(writer))
+        self.assertEqual(gltf["extensionsUsed"], ["MSFT_lod"])
+        node = gltf["nodes"][primary]
+        self.assertEqual(node["mesh"], meshes[0])
+        self.assertEqual([gltf["nodes"][i]["mesh"] for i in node["extensions"]["MSFT_lod"]["ids"]], meshes[1:])
+        self.assertEqual(node["extras"]["MSFT_screencoverage"], [0.5, 0.2, 0.01])
+
+    def test_quantized(self):
+        mesh = tetrahedron()
+        mesh.positions = mesh.positions * np.float32(20) + np.float32(5)
+        writer = GlbWriter(quantize=True, optimize=True)
+        index = writer.add_mesh(mesh)
+        node = writer.add_node(index, [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 100, 0, 0, 1], root=True)
+
+        gltf, binary = read_glb(_to_bytes(writer))
+        self.assertIn("KHR_mesh_quantization", gltf["extensionsRequired"])
+        primitive = gltf["meshes"][index]["primitives"][0]
+        position = gltf["accessors"][primitive["attributes"]["POSITION"]]
+        self.assertEqual(position["componentType"], 5123)
+        self.assertEqual(position["max"], [65535, 65535, 65535])
+        normal = gltf["accessors"][primitive["attributes"]["NORMAL"]]
+        self.assertEqual((normal["componentType"], normal["normalized"]), (5120, True))
+
+        view = gltf["bufferViews"][position["bufferView"]]
+        quantized = np.frombuffer(binary, np.uint16, 16, view["byteOffset"]).reshape(4, 4)[:, :3]
+        matrix = np.reshape(gltf["nodes"][node]["matrix"], (4, 4)).T
+        restored = (matrix[:3, :3] @ quantized.T).T + matrix[:3, 3]
+        indices_view = gltf["bufferViews"][gltf["accessors"][primitive["indices"]]["bufferView"]]
+        indices = np.frombuffer(binary, np.uint16, 12, indices_view["byteOffset"]).reshape(-1, 3)
+        expected = mesh.positions[mesh.indices] + [100, 0, 0]
+        self.assertEqual(
+            sorted(map(sorted, np.round(restored[indices], 3).tolist())),
+            sorted(map(sorted, np.round(expected, 3).tolist())),
+        )
+
+    def test_quantized_with_children(self):
+        writer = GlbWriter(quantize=True)
+        index = writer.add_mesh(tetrahedron())
+        child = writer.add_node(matrix=[1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 5, 0, 0, 1])
+        parent = writer.add_node(index, [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 100, 0, 0, 1], children=[child], root=True)
+
+        gltf, _ = read_glb(_to_bytes(writer))
+        node = gltf["nodes"][parent]
+        self.assertNotIn("mesh", node)
+        self.assertEqual(node["matrix"][12:15], [100, 0, 0])
+        leaf, other = node["children"]
+        self.assertEqual(other, child)
+        self.assertEqual(gltf["nodes"][leaf]["mesh"], index)
+        self.assertNotIn("children", gltf["nodes"][leaf])
+        self.assertEqual(gltf["nodes"][leaf]["matrix"], writer.dequantize[index])
+
+    def test_optimize_indices(self):
+        positions = np.random.default_rng(0).uniform(size=(50, 3)).astype(np.float32)
+        indices = np.random.default_rng(1).integers(0, 40, size=(30, 3))
+        optimized, used = optimize_indices(indices, positions)
+        self.assertEqual(optimized.reshape(-1)[0], 0)
+        self.assertTrue((np.diff(np.maximum.accumulate(optimized.reshape(-1))) <= 1).all())
+        self.assertEqual(
+            sorted(map(tuple, positions[used][optimized].reshape(-1, 9).tolist())),
+            sorted(map(tuple, positions[indices].reshape(-1, 9).tolist())),
+        )
+
+    def test_merge_meshes(self):
+        first, second = tetrahedron(), tetrahedron()
+        second.positions = second.positions + np.float32(2)
+        merged = merge_meshes([first, second], "merged")
+        self.assertEqual(merged.indices.dtype, np.uint32)
+        self.assertEqual(len(merged.positions), 8)
+        self.assertEqual(merged.triangle_count, 8)
+        np.testing.assert_array_equal(merged.indices[:4], first.indices)
+        np.testing.assert_array_equal(merged.indices[4:], first.indices + 4)
+        np.testing.assert_array_equal(merged.positions[merged.indices[4:]], second.positions[second.indices])
+        self.assertEqual(merge_meshes([]).triangle_count, 0)
+
+    def test_padded_attribute(self):
+        writer = GlbWriter()
+        accessor = writer.add_accessor(np.ones((5, 3), dtype=np.int8), ARRAY_BUFFER, normalized=True)
+        view = writer.gltf["bufferViews"][writer.gltf["accessors"][accessor]["bufferView"]]
+        self.assertEqual(view["byteStride"], 4)
+        self.assertEqual(view["byteLength"], 20)
+
+    def test_empty(self):
+        gltf, binary = read_glb(_to_bytes(GlbWriter()))
+        self.assertNotIn("buffers", gltf)
+        self.assertEqual(binary, b"")
+
+
+def _to_bytes(writer: GlbWriter) -> bytes:
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    unittest.main()
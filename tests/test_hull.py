@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from caddie.types.hull import convex_hull, hull_polygon, octagon_filter
+
+
+class TestHull(unittest.TestCase):
+
+    def test_square(self):
+        points = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0.5, 0.5], [0.5, 0], [0.2, 0.7]])
+        hull = convex_hull(points)
+        self.assertEqual(hull.tolist(), [[0, 0], [1, 0], [1, 1], [0, 1]])
+
+    def test_degenerate(self):
+        self.assertEqual(len(convex_hull(np.empty((0, 2)))), 0)
+        self.assertEqual(convex_hull([[1, 2], [1, 2]]).tolist(), [[1, 2]])
+        self.assertEqual(convex_hull([[0, 0], [1, 1], [2, 2], [3, 3]]).tolist(), [[0, 0], [3, 3]])
+
+    def test_circle(self):
+        rng = np.random.default_rng(0)
+        angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+        ring = np.column_stack((np.cos(angles), np.sin(angles)))
+        inner = rng.uniform(-0.7, 0.7, (100000, 2))
+        hull = convex_hull(np.concatenate((inner, ring)))
+        self.assertEqual(len(hull), 64)
+        self.assertEqual({tuple(p) for p in hull.tolist()}, {tuple(p) for p in ring.tolist()})
+
+    def test_convex_cap(self):
+        # Every point is a hull vertex, but nearly collinear with its neighbours.
+        x = np.linspace(-1, 1, 20000)
+        points = np.column_stack((x, -1e-9 * x * x))
+        hull = convex_hull(points[::-1])
+        np.testing.assert_array_equal(hull, np.concatenate((points[:1], points[:0:-1])))
+
+    def test_octagon_filter(self):
+        rng = np.random.default_rng(1)
+        points = rng.uniform(-1, 1, (10000, 2))
+        filtered = octagon_filter(points)
+        self.assertLess(len(filtered), len(points) // 2)
+        np.testing.assert_array_equal(convex_hull(filtered), convex_hull(points))
+
+    def test_random_against_area(self):
+        rng = np.random.default_rng(2)
+        points = rng.normal(size=(5000, 2))
+        polygon, hull = hull_polygon(points)
+        self.assertEqual(len(polygon.vertices), len(hull))
+        self.assertTrue(polygon.is_convex)
+        self.assertGreater(polygon.area, 0)
+        # Every point is on the inner side of every hull edge.
+        for a, b in zip(hull, np.roll(hull, -1, axis=0)):
+            cross = (b[0] - a[0]) * (points[:, 1] - a[1]) - (b[1] - a[1]) * (points[:, 0] - a[0])
+            self.assertTrue((cross >= -1e-12).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
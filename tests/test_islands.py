@@ -0,0 +1,112 @@
+import random
+import unittest
+
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_MakePolygon, BRepBuilderAPI_MakeFace
+from OCC.Core.BRepGProp import brepgprop
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.gp import gp_Pnt
+
+from caddie import trace
+from caddie.shape2d.sketch import Islands, overlapping_pairs
+
+TOL = 1e-5
+
+
+def rectangle(xmin, ymin, xmax, ymax):
+    polygon = BRepBuilderAPI_MakePolygon()
+    for x, y in ((xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)):
+        polygon.Add(gp_Pnt(x, y, 0))
+    polygon.Close()
+    return BRepBuilderAPI_MakeFace(polygon.Wire()).Face()
+
+
+def area(shape) -> float:
+    props = GProp_GProps()
+    brepgprop.SurfaceProperties(shape, props)
+    return props.Mass()
+
+
+class TestIslands(unittest.TestCase):
+
+    def setUp(self):
+        trace.tracer.clear()
+        trace.enable()
+
+    def tearDown(self):
+        trace.disable()
+        trace.tracer.clear()
+
+    def booleans(self, name: str) -> int:
+        return trace.summary().get(name, {}).get("count", 0)
+
+    def test_overlapping_pairs_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            boxes = []
+            for _ in range(rng.randint(0, 12)):
+                x, y = rng.uniform(0, 10), rng.uniform(0, 10)
+                boxes.append((x, y, x + rng.uniform(0, 3), y + rng.uniform(0, 3)))
+            expected = {
+                (i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))
+                if boxes[i][0] <= boxes[j][2] and boxes[j][0] <= boxes[i][2]
+                and boxes[i][1] <= boxes[j][3] and boxes[j][1] <= boxes[i][3]
+            }
+            self.assertEqual({tuple(sorted(p)) for p in overlapping_pairs(boxes)}, expected)
+
+    def test_disjoint_faces_skip_boolean(self):
+        islands = Islands(TOL)
+        islands.fuse([rectangle(0, 0, 1, 1), rectangle(2, 0, 3, 1), rectangle(0, 2, 1, 3)])
+        self.assertEqual(len(islands.shapes), 3)
+        self.assertEqual(self.booleans("BRepAlgoAPI_Fuse"), 0)
+
+        islands.fuse([rectangle(0.5, 0.5, 2.5, 0.8)])
+        self.assertEqual(len(islands.shapes), 2)
+        self.assertEqual(self.booleans("BRepAlgoAPI_Fuse"), 1)
+        self.assertAlmostEqual(area(islands.compound()), 3 + 2 * 0.3 - 2 * 0.5 * 0.3, places=6)
+
+    def test_cut_outside_islands_is_no_op(self):
+        islands = Islands(TOL)
+        islands.fuse([rectangle(0, 0, 1, 1), rectangle(2, 0, 3, 1)])
+        shapes = list(islands.shapes)
+        islands.cut([rectangle(5, 5, 6, 6)])
+        self.assertEqual(self.booleans("BRepAlgoAPI_Cut"), 0)
+        self.assertTrue(all(a.IsSame(b) for a, b in zip(shapes, islands.shapes)))
+
+        islands.cut([rectangle(2.5, -1, 4, 2)])
+        self.assertEqual(self.booleans("BRepAlgoAPI_Cut"), 1)
+        self.assertTrue(islands.shapes[0].IsSame(shapes[0]))
+        self.assertAlmostEqual(area(islands.compound()), 1.5, places=6)
+
+    def test_leading_sub(self):
+        islands = Islands(TOL)
+        islands.cut([rectangle(0, 0, 4, 4), rectangle(1, 1, 2, 2), rectangle(10, 10, 11, 11)])
+        self.assertEqual(len(islands.shapes), 1)
+        self.assertEqual(self.booleans("BRepAlgoAPI_Cut"), 1)
+        self.assertAlmostEqual(area(islands.compound()), 15, places=6)
+
+    def test_merged_box_overlaps_third_island(self):
+        islands = Islands(TOL)
+        # An L of two faces whose merged box covers the corner where the third face is,
+        # although neither face overlaps it.
+        islands.fuse([rectangle(0, 0, 1, 3), rectangle(1.5, 2, 3, 3), rectangle(1.5, 0, 3, 1)])
+        self.assertEqual(len(islands.shapes), 3)
+        islands.fuse([rectangle(0.5, 2.2, 2, 2.8)])
+        self.assertEqual(len(islands.shapes), 2)
+        self.assertEqual(self.booleans("BRepAlgoAPI_Fuse"), 1)
+
+        # The merged box now overlaps the third island. A cut inside the third island only
+        # reaches the merged island through its box, which must leave its area unchanged.
+        merged, third = islands.boxes
+        self.assertEqual(overlapping_pairs([merged, third]), [(0, 1)])
+        islands.cut([rectangle(2, 0.2, 2.8, 0.8)])
+        self.assertAlmostEqual(area(islands.shapes[0]), 3 + 1.5 + 0.9 - 0.6, places=6)
+        self.assertAlmostEqual(area(islands.shapes[1]), 1.5 - 0.48, places=6)
+
+        # Fusing clusters the overlapping boxes, which must still give the right disjoint result.
+        islands.fuse([rectangle(5, 5, 6, 6)])
+        self.assertEqual(len(islands.shapes), 2)
+        self.assertAlmostEqual(area(islands.compound()), 3 + 1.5 + 0.9 - 0.6 + 1.5 - 0.48 + 1, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import unittest
+
+from caddie.trace import Tracer, NULL_SPAN
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_disabled_is_no_op(self):
+        tracer = Tracer()
+        with tracer.span("op") as s:
+            s.set(cache="hit")
+        assert s is NULL_SPAN
+        assert tracer.events == []
+
+    def test_chrome_trace_and_summary(self):
+        tracer = Tracer()
+        tracer.enable()
+        for cache in ("hit", "miss", "miss"):
+            with tracer.span("SketchBuilder", tolerance=1e-5) as s:
+                s.set(cache=cache)
+
+        summary = tracer.summary()["SketchBuilder"]
+        assert summary["count"] == 3
+        assert summary["cache_hits"] == 1
+        assert summary["cache_misses"] == 2
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.write_chrome_trace(path)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        assert [e["ph"] for e in events] == ["X"] * 3
+        assert events[0]["args"]["tolerance"] == 1e-5